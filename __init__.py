@@ -0,0 +1,36 @@
+"""
+Tools for GNC analysis.
+
+Submodules, and the public names below, are imported on first access ('gnctools.coord', 'gnctools.RotationArray'),
+so importing the package costs nothing until they're used.
+"""
+
+from importlib import import_module
+
+_SUBMODULES = ('coord', 'io', 'plot', 'signal', 'util')
+
+# public name -> submodule it's defined in
+_API = {name: mod for mod, names in
+        (('coord',  ('Rotation', 'RotationArray', 'RotationIndex', 'interp_quat', 'euler2quat', 'quat2euler',
+                     'gimbal_lock', 'quat2dcm', 'dcm2quat', 'euler2dcm', 'dcm2euler')),
+         ('io',     ('Dataset', 'load', 'save', 'loadtxt', 'loadtxt_iter', 'loadtxt_col', 'savetxt', 'loadmat',
+                     'register_reader', 'register_writer')),
+         ('plot',   ('cozero_twins', 'cozero_figure', 'lodplot', 'LODLine')),
+         ('signal', ('psd', 'welch', 'WelchAccumulator', 'spectrogram', 'stpsd_iter', 'design_sos', 'lowpass',
+                     'Filter', 'decimate', 'Decimator', 'sinusoid')),
+         ('util',   ('runExe', 'runCampaign', 'CaseResult', 'ResultCache', 'share_domain', 'InterpPlan',
+                     'StreamAligner', 'convertToMAT', 'convertTree')))
+        for name in names}
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return import_module('.' + name, __name__)
+    if name in _API:
+        value = getattr(import_module('.' + _API[name], __name__), name)
+        globals()[name] = value  # later lookups skip __getattr__
+        return value
+
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_API))
@@ -0,0 +1,70 @@
+"""
+Command line interface; run as 'python -m gnctools <command> ...'.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from .util import convertTree
+
+def main(argv: list = None):
+    """
+    Parses the command line and runs the command requested.
+
+    :param argv: arguments, sys.argv[1:] if not specified
+    :return:     exit status
+    """
+
+    parser = argparse.ArgumentParser(prog='gnctools', description='Tools for GNC analysis.')
+    sub    = parser.add_subparsers(dest='command', required=True)
+
+    conv = sub.add_parser('convert', help='convert ascii tables to MAT files, in parallel')
+    conv.add_argument('paths', nargs='+', help='directories (searched recursively), files, or glob patterns')
+    conv.add_argument('-p', '--pattern', default='*.dat', help="filename pattern to match in directories ('*.dat')")
+    conv.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (all cores)')
+    conv.add_argument('--fmt', choices=('5', '7.3'), default='5', help="MAT file version ('5')")
+    conv.add_argument('--delete-orig', action='store_true', help='delete each original once converted')
+    conv.add_argument('-f', '--force', action='store_true', help='convert even if the output is up to date')
+    conv.add_argument('-q', '--quiet', action='store_true', help="don't print progress")
+
+    imp = sub.add_parser('importtime', help='time a cold import (python -X importtime); fails if over budget')
+    imp.add_argument('module', nargs='?', default='gnctools.coord', help="module to import ('gnctools.coord')")
+    imp.add_argument('-b', '--budget', type=float, default=0.25, help='allowed cumulative import time, s (0.25)')
+    imp.add_argument('-n', '--repeat', type=int, default=5, help='cold imports to take the best of (5)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        results = convertTree(args.paths, args.pattern, args.jobs, args.delete_orig, args.force,
+                              verbose=not args.quiet, fmt=args.fmt)
+        return int(any(isinstance(r, Exception) for r in results.values()))
+
+    if args.command == 'importtime':
+        best = min(importtime(args.module) for _ in range(args.repeat))
+        print('{}: {:.1f} ms (budget {:.1f} ms)'.format(args.module, best*1e3, args.budget*1e3))
+        return int(best > args.budget)
+
+def importtime(module: str):
+    """
+    Imports a module in a fresh interpreter, under 'python -X importtime'.
+
+    :param module: dotted module name
+    :return:       cumulative import time of the module, s
+    """
+
+    env  = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                          env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    # lines are 'import time: <self us> | <cumulative us> | <indented name>'
+    for line in proc.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) * 1e-6
+
+    raise RuntimeError("No import time reported for '{}'".format(module))
+
+if __name__ == '__main__':
+    sys.exit(main())
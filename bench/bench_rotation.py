@@ -0,0 +1,54 @@
+"""
+Micro-benchmark of Rotation per-op latency and RotationArray batched throughput.
+
+Run from the directory containing the gnctools package:  python gnctools/bench/bench_rotation.py
+"""
+
+import numpy as np
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from gnctools.coord import Rotation, RotationArray
+
+NUMBER = 100000 # calls per timing, per-op benchmarks
+REPEAT = 3      # timings per benchmark; the best is reported
+NBATCH = 100000 # rotations per batched benchmark
+
+def best(stmt, number, **ns):
+    """
+    Returns the best time per call of stmt, s.
+    """
+
+    return min(timeit.repeat(stmt, globals=ns, number=number, repeat=REPEAT)) / number
+
+def main():
+    q1 = np.array((0.5, 0.5, 0.5, 0.5))
+    r1 = Rotation.fromQuat(q1)
+    r2 = Rotation.fromEulerZYX(0.1, 0.2, 0.3)
+
+    print('Rotation, per op (best of {} x {}):'.format(REPEAT, NUMBER))
+    for name, stmt in (('compose',  'r1 * r2'),
+                       ('inverse',  'r1.inverse'),
+                       ('fromQuat', 'Rotation.fromQuat(q1)'),
+                       ('dcm',      'r1.dcm')):
+        t = best(stmt, NUMBER, r1=r1, r2=r2, q1=q1, Rotation=Rotation)
+        print('  {:10s} {:8.2f} us'.format(name, t*1e6))
+
+    rng  = np.random.default_rng(0)
+    ra1  = RotationArray.fromQuat(rng.normal(size=(NBATCH, 4)))
+    ra2  = RotationArray.fromQuat(rng.normal(size=(NBATCH, 4)))
+    vecs = rng.normal(size=(NBATCH, 3))
+
+    print('RotationArray, N = {} (best of {}):'.format(NBATCH, REPEAT))
+    for name, stmt in (('compose', 'ra1 * ra2'),
+                       ('inverse', 'ra1.inverse'),
+                       ('dcm',     'ra1.dcm'),
+                       ('rotate',  'ra1.rotate(vecs)')):
+        t = best(stmt, 10, ra1=ra1, ra2=ra2, vecs=vecs)
+        print('  {:10s} {:8.2f} ms  ({:6.1f} ns/rotation)'.format(name, t*1e3, t/NBATCH*1e9))
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,15 @@
 import numpy as np
 
+from math import sqrt
+
 class Rotation:
     """
     Represents a coordinate system rotation in 3-space.
 
     """
 
+    __slots__ = ('_qs', '_qx', '_qy', '_qz')
+
     PIOVER180 = np.pi/180.
 
     """
@@ -29,16 +33,51 @@ class Rotation:
                         eulerx    - x euler angle
                         eulery    - y euler angle
                         eulerz    - z euler angle
-                        eulerseq  - euler sequence, ('xyz')
+                        eulerseq  - euler sequence, ('xyz'); intrinsic, any of EULER_SEQS
                         units     - 'deg' or 'rad'
 
+                        with no args or kwargs, the identity rotation
+
         :return:        nothing
         """
 
-        self._qs = float()
-        self._qx = float()
-        self._qy = float()
-        self._qz = float()
+        KWARGS = {'dcm', 'quat', 'scalarpos', 'eulerx', 'eulery', 'eulerz', 'eulerseq', 'units'}
+        if not KWARGS.issuperset(kwargs):
+            raise TypeError('Unexpected keyword argument(s): {}'.format(', '.join(set(kwargs) - KWARGS)))
+
+        seq   = kwargs.get('eulerseq', 'xyz')
+        units = kwargs.get('units', 'rad')
+
+        if len(args) == 1:
+            arg = np.asarray(args[0], dtype=np.float64)
+            if arg.shape == (3, 3):
+                kwargs['dcm'] = arg
+            elif arg.shape == (4,):
+                kwargs['quat'] = arg
+            else:
+                raise ValueError('Single argument must be a 4-element quaternion or a 3x3 DCM')
+        elif len(args) == 3:
+            kwargs['euler'] = args
+        elif len(args) != 0:
+            raise TypeError('Rotation takes 0, 1 or 3 positional arguments ({} given)'.format(len(args)))
+
+        if 'dcm' in kwargs:
+            q = dcm2quat(kwargs['dcm'])
+        elif 'quat' in kwargs:
+            q = np.asarray(kwargs['quat'], dtype=np.float64)
+            if kwargs.get('scalarpos', 'first') == 'last':
+                q = np.roll(q, 1)
+        elif 'euler' in kwargs:
+            q = euler2quat(kwargs['euler'], seq, units)
+        elif {'eulerx', 'eulery', 'eulerz'} & set(kwargs):
+            if _euler_entry(seq)[2]:
+                raise ValueError("Angles by axis (eulerx/y/z) are ambiguous for sequence '{}'".format(seq))
+            q = euler2quat([kwargs.get('euler' + ax, 0.) for ax in seq.lower()], seq, units)
+        else:
+            q = (1., 0., 0., 0.)
+
+        self._qs, self._qx, self._qy, self._qz = (float(c) for c in q)
+        self._normalize()
 
     @staticmethod
     def fromQuat(quat,
@@ -59,19 +98,29 @@ class Rotation:
             if not isinstance(q, float):
                 raise ValueError('Argument must be a 4-element iterable of floats')
 
-        rot = Rotation()
         if scalarfirst:
-            rot._qs = quat[0]
-            rot._qx = quat[1]
-            rot._qy = quat[2]
-            rot._qz = quat[3]
+            return Rotation._fromComponents(quat[0], quat[1], quat[2], quat[3])
         else:
-            rot._qs = quat[3]
-            rot._qx = quat[0]
-            rot._qy = quat[1]
-            rot._qz = quat[2]
+            return Rotation._fromComponents(quat[3], quat[0], quat[1], quat[2])
+
+    @staticmethod
+    def _fromComponents(qs: float,
+                        qx: float,
+                        qy: float,
+                        qz: float):
+        """
+        Internal fast constructor; skips input validation and __init__, normalizes with plain float arithmetic.
+
+        :return: Rotation object
+        """
+
+        rot = Rotation.__new__(Rotation)
+        n = sqrt(qs*qs + qx*qx + qy*qy + qz*qz)
+        rot._qs = qs / n
+        rot._qx = qx / n
+        rot._qy = qy / n
+        rot._qz = qz / n
 
-        rot._normalize()
         return rot
 
     @staticmethod
@@ -101,6 +150,34 @@ class Rotation:
 
         return rot
 
+    @staticmethod
+    def fromEuler(angles,
+                  seq:   str = 'zyx',
+                  units: str = 'rad'):
+        """
+        Factory method to construct a Rotation object from euler angles in any sequence (see euler2quat).
+
+        :param angles: 3-element iterable, in the order of seq
+        :param seq:    intrinsic rotation sequence, e.g. 'zyx', 'xyz', 'zxz'
+        :param units:  'rad' or 'deg'
+
+        :return:       Rotation object
+        """
+
+        return Rotation._fromComponents(*euler2quat(angles, seq, units).tolist())
+
+    @staticmethod
+    def fromDCM(dcm):
+        """
+        Factory method to construct a Rotation object from a DCM (see dcm).
+
+        :param dcm: 3x3 numpy.ndarray
+
+        :return:    Rotation object
+        """
+
+        return Rotation._fromComponents(*dcm2quat(dcm).tolist())
+
     @property
     def quat(self):
         """
@@ -113,7 +190,7 @@ class Rotation:
         """
         Returns the conjugate quaternion.
         """
-        return self.quat * np.array((1, -1, -1, -1))
+        return np.array((self._qs, -self._qx, -self._qy, -self._qz))
 
     @property
     def dcm(self):
@@ -139,18 +216,10 @@ class Rotation:
         bd = b * d
         cd = c * d
 
-        dcm = np.empty((3,3))
-        dcm[0, 0] = dd + aa - bb - cc
-        dcm[0, 1] = 2.0 * ( cd + ab)
-        dcm[0, 2] = 2.0 * ( ac - bd)
-        dcm[1, 0] = 2.0 * ( ab - cd)
-        dcm[1, 1] = dd - aa + bb - cc
-        dcm[1, 2] = 2.0 * ( ad + bc)
-        dcm[2, 0] = 2.0 * ( bd + ac)
-        dcm[2, 1] = 2.0 * ( bc - ad)
-        dcm[2, 2] = dd - aa - bb + cc
-
-        return dcm
+        # flat tuple -> reshape is the cheapest way to get 9 floats into an ndarray
+        return np.array((dd + aa - bb - cc, 2.0 * ( cd + ab), 2.0 * ( ac - bd),
+                         2.0 * ( ab - cd), dd - aa + bb - cc, 2.0 * ( ad + bc),
+                         2.0 * ( bd + ac), 2.0 * ( bc - ad), dd - aa - bb + cc)).reshape(3, 3)
 
     @property
     def eulerZYX(self):
@@ -160,13 +229,24 @@ class Rotation:
         :return: a tuple
         """
 
-        qs, q1, q2, q3 = self.quat
-        roll  = np.arctan2(2 * (qs * q1 + q2 * q3), 1 - 2 * (q1**2 - q2**2))
+        qs, q1, q2, q3 = self._qs, self._qx, self._qy, self._qz
+        roll  = np.arctan2(2 * (qs * q1 + q2 * q3), 1 - 2 * (q1**2 + q2**2))
         pitch = np.arcsin(2 * (qs * q2 - q3 * q1))
         yaw   = np.arctan2(2 * (qs * q3 + q1 * q2), 1 - 2 * (q2**2 + q3**2))
 
         return yaw, pitch, roll
 
+    def euler(self,
+              seq:   str = 'zyx',
+              units: str = 'rad'):
+        """
+        Returns the equivalent euler angles in any sequence (see quat2euler).
+
+        :return: a tuple, in the order of seq
+        """
+
+        return tuple(quat2euler(self.quat, seq, units).tolist())
+
     def angular_diff(self, rot):
         """
         Calculates the angle of rotation required to get from the orientation encapsulated herein to the
@@ -180,9 +260,9 @@ class Rotation:
         Comparison and Analysis"--Huynh
         """
 
-        qprod = self.quat*rot.quat
+        dot = self._qs*rot._qs + self._qx*rot._qx + self._qy*rot._qy + self._qz*rot._qz
 
-        return np.arccos(2*np.sum(qprod)**2 - 1)
+        return np.arccos(min(2*dot**2 - 1, 1.))
 
     @property
     def inverse(self):
@@ -190,9 +270,8 @@ class Rotation:
         Returns the inverse of this rotation.
         """
 
-        d = sum(self.quat**2)
-
-        return Rotation.fromQuat(self.quat_conj / d)
+        # conjugate over the squared norm; _fromComponents normalizes, so the division is implicit
+        return Rotation._fromComponents(self._qs, -self._qx, -self._qy, -self._qz)
 
     def _normalize(self):
         """
@@ -201,8 +280,11 @@ class Rotation:
         :return: Nothing.
         """
 
-        q = self.quat
-        self._qs, self._qx, self._qy, self._qz = q/np.linalg.norm(q)
+        n = sqrt(self._qs**2 + self._qx**2 + self._qy**2 + self._qz**2)
+        self._qs /= n
+        self._qx /= n
+        self._qy /= n
+        self._qz /= n
 
     @staticmethod
     def _in_radians(ang, units):
@@ -224,7 +306,7 @@ class Rotation:
         return ang
 
     @staticmethod
-    def __mult_quat_quat(q1, q2):
+    def _mult_quat_quat(q1, q2):
         """
         Assumes scalar is first element
         """
@@ -237,7 +319,7 @@ class Rotation:
         return a_s, a_1, a_2, a_3
 
     @staticmethod
-    def __mult_quat_vec(q, v):
+    def _mult_quat_vec(q, v):
         """
         Rotates a vector according to provided quaternion.
 
@@ -257,6 +339,24 @@ class Rotation:
 
         return x, y, z
 
+    def rotate(self,
+               vecs: '(N,3) or (3,) numpy.ndarray',
+               out:  'numpy.ndarray' = None):
+        """
+        Applies the rotation to every row of an array of vectors in one pass.  float32 input stays float32, anything
+        else is computed in float64.
+
+        :param vecs: (N,3) or (3,) array of vectors
+        :param out:  optional array to write the result into; must match the shape and dtype of the result
+
+        :return:     the rotated vectors, same shape as vecs
+        """
+
+        v = RotationArray._sanitize_vecs(vecs)
+
+        # v' = dcm.v for each row, so stack rows and post-multiply by the transpose
+        return np.matmul(v, self.dcm.T.astype(v.dtype), out=out)
+
     #TODO: add __check_type and __sanitize_type methods (static) to sanitize inputs, centralize this
     #      job so other methods can use the same code to do this job.
 
@@ -266,20 +366,934 @@ class Rotation:
         Overloads the * operator.  Applies the rotation to a vector or other rotation;
         returns the result of the rotation.
 
-        :param      other: 3-space vector-like (tuple/list/numpy.ndarray), or
+        :param      other: 3-space vector-like (tuple/list/numpy.ndarray), (N,3) numpy.ndarray of vectors, or
                            other Rotation object
 
-        :return:    the resulting rotated vector
+        :return:    the resulting rotated vector (a tuple, or a numpy.ndarray if given one)
         """
 
         if isinstance(other, self.__class__):
             # rotate a rotation
-            return Rotation.fromQuat(Rotation.__mult_quat_quat(self.quat, other.quat))
-        elif hasattr(other, '__iter__') and len(other) == 3 and isinstance(other[0], float):
+            return Rotation._fromComponents(*Rotation._mult_quat_quat((self._qs,  self._qx,  self._qy,  self._qz),
+                                                                      (other._qs, other._qx, other._qy, other._qz)))
+        elif isinstance(other, RotationArray):
+            # rotate each rotation of the array
+            return other._compose(self.quat, other.quat.T)
+        elif isinstance(other, np.ndarray):
+            # rotate an array of vectors
+            return self.rotate(other)
+        elif hasattr(other, '__iter__') and len(other) == 3 and isinstance(other[0], (float, np.floating)):
             # rotate a vector
-            return Rotation.__mult_quat_vec(self.quat, other)
+            return Rotation._mult_quat_vec(self.quat, other)
         else:
             # don't know what that is
             raise TypeError('Operand only supported for operations between 2 Rotation objects or \
                              by 1 Rotation object and a 3-element iterable')
 
+
+
+class RotationArray:
+    """
+    Represents a sequence of coordinate system rotations in 3-space, stored as one contiguous (N,4) array of
+    scalar-first quaternions.  Mirrors the Rotation interface, but each operation is a single numpy pass over
+    the whole array.
+
+    """
+
+    __slots__ = ('_q',)
+
+    """
+    Member variables:
+    _q = numpy.ndarray, (N,4)
+    """
+
+    def __init__(self, quats: 'numpy.ndarray, (N,4)' = None):
+        """
+        Wraps the given (N,4) array of unit, scalar-first quaternions without copying or validating it.  Use the
+        factory methods to build a RotationArray from external data.
+
+        :param quats: (N,4) numpy.ndarray; empty if not specified
+
+        :return:      nothing
+        """
+
+        self._q = np.empty((0, 4)) if quats is None else quats
+
+    @staticmethod
+    def fromQuat(quats,
+                 scalarfirst: bool = True):
+        """
+        Factory method to construct a RotationArray from an array of quaternions.
+
+        :param quats:       (N,4) numpy.ndarray or other nested iterable of quaternions
+        :param scalarfirst: denotes whether the scalar is first, if not, assumes last
+
+        :return:            RotationArray object
+        """
+
+        q = np.array(quats, dtype=np.float64, ndmin=2)
+
+        # validate input:
+        if q.ndim != 2 or q.shape[1] != 4:
+            raise ValueError('Argument must be an (N,4) array of quaternions')
+
+        if not scalarfirst:
+            q = np.roll(q, 1, axis=1)
+
+        return RotationArray(RotationArray._normalize(np.ascontiguousarray(q)))
+
+    @staticmethod
+    def fromEulerZYX(z, y, x, units='rad'):
+        """
+        Factory method to construct a RotationArray from arrays of euler angles.
+
+        :param z:      z angles
+        :param y:      y angles
+        :param x:      x angles
+        :param units:  'rad' or 'deg'
+
+        :return:       RotationArray object
+        """
+
+        s = np.sin
+        c = np.cos
+
+        z, y, x = (np.asarray(a, dtype=np.float64) / 2 for a in (z, y, x))
+        z, y, x = Rotation._in_radians((z, y, x), units)
+        z, y, x = np.broadcast_arrays(z, y, x)
+
+        q = np.empty(z.shape + (4,))
+        q[..., 0] = c(x)*c(y)*c(z) + s(x)*s(y)*s(z)
+        q[..., 1] = s(x)*c(y)*c(z) - c(x)*s(y)*s(z)
+        q[..., 2] = c(x)*s(y)*c(z) + s(x)*c(y)*s(z)
+        q[..., 3] = c(x)*c(y)*s(z) - s(x)*s(y)*c(z)
+
+        return RotationArray(q.reshape(-1, 4))
+
+    @staticmethod
+    def fromEuler(angles: '(N,3) array-like',
+                  seq:    str = 'zyx',
+                  units:  str = 'rad'):
+        """
+        Factory method to construct a RotationArray from euler angles in any sequence (see euler2quat).
+
+        :param angles: (N,3) array, columns in the order of seq
+        :param seq:    intrinsic rotation sequence, e.g. 'zyx', 'xyz', 'zxz'
+        :param units:  'rad' or 'deg'
+
+        :return:       RotationArray object
+        """
+
+        return RotationArray(euler2quat(angles, seq, units).reshape(-1, 4))
+
+    @staticmethod
+    def fromDCM(dcm: '(N,3,3) array-like'):
+        """
+        Factory method to construct a RotationArray from DCMs (see dcm).
+
+        :return: RotationArray object
+        """
+
+        return RotationArray(dcm2quat(dcm).reshape(-1, 4))
+
+    @staticmethod
+    def fromRates(t:         'numpy.ndarray, (N,)',
+                  rates:     'numpy.ndarray, (N,3)',
+                  q0:        'Rotation' = None,
+                  chunksize: int = 65536,
+                  renorm:    int = 1,
+                  out:       'numpy.ndarray, (N,4)' = None):
+        """
+        Factory method to propagate an attitude history from body angular rates (quaternion kinematics,
+        qdot = q*[0, w]/2), holding each rate sample constant until the next time stamp.
+
+        Each step uses the exact exponential-map increment exp(w*dt/2), computed for a whole chunk at once; the
+        increments are chained with a cumulative quaternion product (see _cumprod) and the attitude is carried
+        from one chunk to the next, so memory is bounded by chunksize, not by N.
+
+        :param t:         time stamps, (N,)
+        :param rates:     body angular rates, rad/s, (N,3); the last sample is unused
+        :param q0:        initial attitude; identity if not specified
+        :param chunksize: number of samples processed per vectorized pass
+        :param renorm:    renormalize the quaternions every renorm chunks; 0 to never renormalize
+        :param out:       optional (N,4) float64 array to write the quaternions into (e.g. a numpy.memmap)
+
+        :return:          RotationArray object, backed by out if given
+        """
+
+        t     = np.asarray(t, dtype=np.float64)
+        rates = np.asarray(rates, dtype=np.float64)
+        if rates.shape != (len(t), 3):
+            raise ValueError('rates must be an (N,3) array matching the length of t')
+
+        if out is None:
+            out = np.empty((len(t), 4))
+        if len(t) == 0:
+            return RotationArray(out)
+
+        out[0] = (1., 0., 0., 0.) if q0 is None else q0.quat
+
+        for ichunk, start in enumerate(range(0, len(t) - 1, chunksize)):
+            stop = min(start + chunksize, len(t) - 1)
+
+            # increments over [t_k, t_k+1]
+            dt = np.diff(t[start:stop + 1])
+            dq = RotationArray._exp(rates[start:stop] * (dt / 2.)[:, np.newaxis])
+
+            out[start + 1:stop + 1] = RotationArray._cumprod(out[start], dq)
+            if renorm and (ichunk + 1) % renorm == 0:
+                RotationArray._normalize(out[start + 1:stop + 1])
+
+        return RotationArray(out)
+
+    @property
+    def quat(self):
+        """
+        Returns the (N,4) array of quaternions representing these rotations.  This is the backing array, not a copy.
+        """
+        return self._q
+
+    @property
+    def quat_conj(self):
+        """
+        Returns the (N,4) array of conjugate quaternions.
+        """
+        return self._q * np.array((1, -1, -1, -1))
+
+    @property
+    def dcm(self):
+        """
+        Returns the DCMs representing the rotations.
+
+        :return: a numpy.ndarray, (N,3,3)
+        """
+
+        d, a, b, c = self._q.T
+
+        dd = d * d
+        aa = a * a
+        bb = b * b
+        cc = c * c
+        ab = a * b
+        ac = a * c
+        ad = a * d
+        bc = b * c
+        bd = b * d
+        cd = c * d
+
+        dcm = np.empty((len(self), 3, 3))
+        dcm[:, 0, 0] = dd + aa - bb - cc
+        dcm[:, 0, 1] = 2.0 * ( cd + ab)
+        dcm[:, 0, 2] = 2.0 * ( ac - bd)
+        dcm[:, 1, 0] = 2.0 * ( ab - cd)
+        dcm[:, 1, 1] = dd - aa + bb - cc
+        dcm[:, 1, 2] = 2.0 * ( ad + bc)
+        dcm[:, 2, 0] = 2.0 * ( bd + ac)
+        dcm[:, 2, 1] = 2.0 * ( bc - ad)
+        dcm[:, 2, 2] = dd - aa - bb + cc
+
+        return dcm
+
+    @property
+    def eulerZYX(self):
+        """
+        Returns the equivalent Yaw, Pitch, Roll Euler sequences, in radians.
+
+        :return: a tuple of 3 arrays
+        """
+
+        qs, q1, q2, q3 = self._q.T
+        roll  = np.arctan2(2 * (qs * q1 + q2 * q3), 1 - 2 * (q1**2 + q2**2))
+        pitch = np.arcsin(np.clip(2 * (qs * q2 - q3 * q1), -1., 1.))
+        yaw   = np.arctan2(2 * (qs * q3 + q1 * q2), 1 - 2 * (q2**2 + q3**2))
+
+        return yaw, pitch, roll
+
+    def euler(self,
+              seq:   str = 'zyx',
+              units: str = 'rad'):
+        """
+        Returns the equivalent euler angles in any sequence (see quat2euler).
+
+        :return: (N,3) numpy.ndarray, columns in the order of seq
+        """
+
+        return quat2euler(self._q, seq, units)
+
+    def gimbal_lock(self,
+                    seq: str = 'zyx'):
+        """
+        Flags the rotations whose euler angles in the given sequence are singular (see gimbal_lock).
+
+        :return: (N,) boolean numpy.ndarray
+        """
+
+        return gimbal_lock(self._q, seq)
+
+    def angular_diff(self, rot):
+        """
+        Calculates the angles of rotation required to get from the orientations encapsulated herein to the
+        given Rotation (or element-wise, to the given RotationArray).
+
+        :param   rot: Rotation or RotationArray of matching length
+
+        :return: array of angular differences, in radians
+
+        Same geodesic distance as Rotation.angular_diff.
+        """
+
+        dot = np.sum(self._q * rot.quat, axis=-1)
+
+        return np.arccos(np.clip(2 * dot**2 - 1, -1., 1.))
+
+    def pairwise_diff(self,
+                      rots:      'RotationArray',
+                      blocksize: int = 1024):
+        """
+        Calculates the angular difference between every rotation herein and every rotation in rots.
+
+        :param rots:      RotationArray (M elements)
+        :param blocksize: number of rows computed per pass
+
+        :return:          (N,M) numpy.ndarray of angular differences, in radians
+        """
+
+        diff = np.empty((len(self), len(rots)))
+        for rows, block in self._iter_pairwise(rots, blocksize):
+            diff[rows] = block
+
+        return diff
+
+    def nearest(self,
+                rots:      'RotationArray',
+                k:         int = 1,
+                blocksize: int = 1024):
+        """
+        Brute-force search for the k rotations in rots closest to each rotation herein.  Memory is bounded by
+        blocksize*len(rots); see RotationIndex for a sublinear search over large catalogs.
+
+        :param rots:      RotationArray to search (M elements)
+        :param k:         number of neighbors to return
+        :param blocksize: number of rows computed per pass
+
+        :return:          (N,k) numpy.ndarray of angular differences, in radians (ascending), and (N,k) indices
+                          into rots
+        """
+
+        k    = min(k, len(rots))
+        ang  = np.empty((len(self), k))
+        inds = np.empty((len(self), k), dtype=np.intp)
+        for rows, block in self._iter_pairwise(rots, blocksize):
+            part  = np.argpartition(block, k - 1, axis=1)[:, :k] if k < len(rots) else \
+                    np.broadcast_to(np.arange(k), block.shape)
+            pang  = np.take_along_axis(block, part, axis=1)
+            order = np.argsort(pang, axis=1)
+            ang[rows]  = np.take_along_axis(pang, order, axis=1)
+            inds[rows] = np.take_along_axis(part, order, axis=1)
+
+        return ang, inds
+
+    def _iter_pairwise(self, rots, blocksize):
+        """
+        Yields (row slice, block of the pairwise angular difference matrix), blocksize rows at a time.
+        """
+
+        for start in range(0, len(self), blocksize):
+            rows = slice(start, start + blocksize)
+            dot  = self._q[rows] @ rots.quat.T
+            yield rows, np.arccos(np.clip(2 * dot**2 - 1, -1., 1.))
+
+    @property
+    def inverse(self):
+        """
+        Returns the inverse of these rotations.
+        """
+
+        return RotationArray(RotationArray._normalize(self.quat_conj))
+
+    def __len__(self):
+        return len(self._q)
+
+    def __iter__(self):
+        for ii in range(len(self._q)):
+            yield self[ii]
+
+    def __getitem__(self, idx):
+        """
+        Integer indices return a Rotation; slices (and index arrays) return a RotationArray.  Slices share memory
+        with this array.
+        """
+
+        q = self._q[idx]
+        if q.ndim == 1:
+            return Rotation._fromComponents(*q.tolist())
+        else:
+            return RotationArray(q)
+
+    def rotate(self,
+               vecs: '(N,3) or (3,) numpy.ndarray',
+               out:  'numpy.ndarray' = None):
+        """
+        Applies the rotations to an array of vectors, element-wise (or all rotations to a single vector).  float32
+        input stays float32, anything else is computed in float64.
+
+        :param vecs: (N,3) array of vectors, or a single (3,) vector
+        :param out:  optional (N,3) array to write the result into
+
+        :return:     (N,3) numpy.ndarray of rotated vectors
+        """
+
+        v = RotationArray._sanitize_vecs(vecs)
+        q = self._q.T.astype(v.dtype, copy=False)
+
+        if out is None:
+            out = np.empty(np.broadcast_shapes(v.shape, (len(self), 3)), dtype=v.dtype)
+
+        out[:, 0], out[:, 1], out[:, 2] = Rotation._mult_quat_vec(q, v.T)
+
+        return out
+
+    @staticmethod
+    def _sanitize_vecs(vecs):
+        """
+        Converts vectors to a float32 or float64 numpy.ndarray, checking for a trailing dimension of 3.
+        """
+
+        v = np.asarray(vecs)
+        if v.dtype != np.float32:
+            v = v.astype(np.float64, copy=False)
+        if v.ndim not in (1, 2) or v.shape[-1] != 3:
+            raise ValueError('Vectors must be given as an (N,3) or (3,) array')
+
+        return v
+
+    @staticmethod
+    def _normalize(q: 'numpy.ndarray, (N,4)'):
+        """
+        Normalizes the quaternions, in place.
+
+        :return: the array given
+        """
+
+        q /= np.sqrt(np.einsum('ij,ij->i', q, q))[:, np.newaxis]
+        return q
+
+    @staticmethod
+    def _mult(q1: 'numpy.ndarray, (...,4)',
+              q2: 'numpy.ndarray, (...,4)'):
+        """
+        Multiplies broadcastable arrays of quaternions (components in the last axis), without normalizing.
+
+        :return: numpy.ndarray, (...,4)
+        """
+
+        return np.stack(Rotation._mult_quat_quat(np.moveaxis(q1, -1, 0), np.moveaxis(q2, -1, 0)), axis=-1)
+
+    @staticmethod
+    def _log(q: 'numpy.ndarray, (N,4)'):
+        """
+        Quaternion logarithm of unit quaternions; returns the vector part, (N,3), which is half the rotation vector.
+        """
+
+        vnorm = np.sqrt(np.einsum('ij,ij->i', q[:, 1:], q[:, 1:]))
+        ang   = np.arctan2(vnorm, q[:, 0])
+        scale = np.divide(ang, vnorm, out=np.ones_like(ang), where=vnorm > 1e-12)
+
+        return q[:, 1:] * scale[:, np.newaxis]
+
+    @staticmethod
+    def _exp(v: 'numpy.ndarray, (N,3)'):
+        """
+        Quaternion exponential of pure (vector) quaternions; inverse of _log.
+
+        :return: numpy.ndarray, (N,4)
+        """
+
+        ang   = np.sqrt(np.einsum('ij,ij->i', v, v))
+        scale = np.divide(np.sin(ang), ang, out=np.ones_like(ang), where=ang > 1e-12)
+
+        q = np.empty((len(v), 4))
+        q[:, 0]  = np.cos(ang)
+        q[:, 1:] = v * scale[:, np.newaxis]
+
+        return q
+
+    @staticmethod
+    def _continuous(q: 'numpy.ndarray, (N,4)'):
+        """
+        Flips quaternion signs so that each sample lies in the same hemisphere as the one before it, i.e. so that
+        interpolating between neighbors takes the shortest path.
+
+        :return: new numpy.ndarray, (N,4)
+        """
+
+        flips = np.einsum('ij,ij->i', q[1:], q[:-1]) < 0.
+        sign  = np.ones(len(q))
+        sign[1:] = np.where(np.logical_xor.accumulate(flips), -1., 1.)
+
+        return q * sign[:, np.newaxis]
+
+    @staticmethod
+    def _slerp(q0: 'numpy.ndarray, (N,4)',
+               q1: 'numpy.ndarray, (N,4)',
+               h:  'numpy.ndarray, (N,)'):
+        """
+        Spherical linear interpolation between pairs of unit quaternions, at fractions h on [0, 1].  Does not
+        take the shortest path on its own; see _continuous.
+
+        :return: numpy.ndarray, (N,4)
+        """
+
+        dot = np.clip(np.einsum('ij,ij->i', q0, q1), -1., 1.)
+        ang = np.arccos(dot)
+        sin = np.sin(ang)
+
+        # fall back to (normalized) linear interpolation where the quaternions (nearly) coincide
+        small = sin < 1e-9
+        sin[small] = 1.
+        w0 = np.where(small, 1. - h, np.sin((1. - h) * ang) / sin)
+        w1 = np.where(small, h,      np.sin(h * ang) / sin)
+
+        q = q0 * w0[:, np.newaxis] + q1 * w1[:, np.newaxis]
+
+        return RotationArray._normalize(q) if np.any(small) else q
+
+    @staticmethod
+    def _cumprod(q0: 'numpy.ndarray, (4,)',
+                 dq: 'numpy.ndarray, (N,4)'):
+        """
+        Cumulative quaternion product, q0*dq_0, q0*dq_0*dq_1, ..., without normalizing.
+
+        Splits dq into blocks of BLOCKLEN samples and scans all blocks in parallel (one vectorized pass per position
+        in the block), then gets the attitude at the start of each block by recursing on the block totals.  Work is
+        O(N) in O(BLOCKLEN*log(N)) numpy calls.
+
+        :return: numpy.ndarray, (N,4)
+        """
+
+        BLOCKLEN = 32
+
+        n    = len(dq)
+        nblk = -(-n // BLOCKLEN)
+
+        # component-major, padded with identities to fill the last block
+        p = np.zeros((4, nblk * BLOCKLEN))
+        p[0] = 1.
+        p[:, :n] = dq.T
+        p = p.reshape(4, nblk, BLOCKLEN)
+
+        # scan within blocks
+        for j in range(1, BLOCKLEN):
+            p[:, :, j] = Rotation._mult_quat_quat(p[:, :, j - 1], p[:, :, j])
+
+        # attitude at the start of each block
+        start = np.empty((nblk, 4))
+        start[0] = q0
+        if nblk > 1:
+            start[1:] = RotationArray._cumprod(q0, p[:, :-1, -1].T)
+
+        return np.stack(Rotation._mult_quat_quat(start.T[:, :, np.newaxis], p), axis=-1).reshape(-1, 4)[:n]
+
+    @staticmethod
+    def _compose(q1, q2):
+        """
+        Multiplies quaternions given as (4,N) or (4,) arrays (component first), so Rotation._mult_quat_quat
+        broadcasts over the samples.
+
+        :return: RotationArray object
+        """
+
+        return RotationArray(RotationArray._normalize(np.stack(Rotation._mult_quat_quat(q1, q2), axis=-1)))
+
+    def __mul__(self,
+                other: 'Rotation, RotationArray, or (N,3)/(3,) vectors'):
+        """
+        Overloads the * operator.  Applies the rotations to vectors or other rotations, element-wise; a single
+        Rotation or vector is applied to all elements.
+
+        :param      other: (N,3) or (3,) vector array, or Rotation/RotationArray object
+
+        :return:    RotationArray of composed rotations, or (N,3) numpy.ndarray of rotated vectors
+        """
+
+        if isinstance(other, (Rotation, RotationArray)):
+            # rotate rotations
+            return RotationArray._compose(self._q.T, other.quat.T)
+        elif hasattr(other, '__iter__'):
+            # rotate vectors
+            return self.rotate(other)
+        else:
+            # don't know what that is
+            raise TypeError('Operand only supported for operations between RotationArray and Rotation(Array) \
+                             objects or vector arrays')
+
+
+class RotationIndex:
+    """
+    Spatial index over a catalog of rotations for fast nearest-attitude and radius searches, by geodesic distance.
+
+    Unit quaternions live on the 3-sphere, where q and -q are the same rotation.  The catalog is stored at both signs
+    in a 4-D k-d tree, so the euclidean (chord) distance to the nearer copy maps monotonically to the geodesic angle:
+    chord = 2*sin(angle/4).
+
+    """
+
+    """
+    Member variables:
+    _n    = int, catalog size
+    _tree = scipy.spatial.cKDTree over the 2N signed quaternions
+    """
+
+    def __init__(self,
+                 rots: 'RotationArray or (N,4) numpy.ndarray'):
+        """
+        :param rots: catalog of rotations
+        """
+
+        from scipy.spatial import cKDTree  # scipy.spatial is slow to import; only nearest-neighbour lookups need it
+
+        q = rots.quat if isinstance(rots, RotationArray) else RotationArray.fromQuat(rots).quat
+
+        self._n    = len(q)
+        self._tree = cKDTree(np.concatenate((q, -q)))
+
+    def __len__(self):
+        return self._n
+
+    def query(self,
+              rots: 'Rotation or RotationArray',
+              k:    int = 1):
+        """
+        Finds the k catalog rotations nearest to each of the given rotations.
+
+        :param rots: query rotation(s)
+        :param k:    number of neighbors to return
+
+        :return:     (M,k) numpy.ndarray of angular differences, in radians (ascending), and (M,k) catalog indices
+        """
+
+        k = min(k, self._n)
+        q = np.atleast_2d(rots.quat)
+
+        # ask for 2k so the second copy of a neighbor can be dropped (only possible for neighbors pi away)
+        kk = min(2 * k, 2 * self._n)
+        chord, inds = self._tree.query(q, k=kk)
+        chord = chord.reshape(len(q), kk)
+        inds  = inds.reshape(len(q), kk) % self._n
+
+        # keep the first occurrence of each catalog index, then the first k of those
+        dup   = np.any((inds[:, :, np.newaxis] == inds[:, np.newaxis, :]) & np.tri(kk, k=-1, dtype=bool), axis=2)
+        order = np.argsort(dup, axis=1, kind='stable')[:, :k]
+        chord = np.take_along_axis(chord, order, axis=1)
+        inds  = np.take_along_axis(inds,  order, axis=1)
+
+        return RotationIndex._chord2angle(chord), inds
+
+    def query_radius(self,
+                     rots: 'Rotation or RotationArray',
+                     r:    float):
+        """
+        Finds all catalog rotations within the given angle of each of the given rotations.
+
+        :param rots: query rotation(s)
+        :param r:    search radius, radians
+
+        :return:     list (one entry per query rotation) of arrays of catalog indices, unordered
+        """
+
+        q = np.atleast_2d(rots.quat)
+        hits = self._tree.query_ball_point(q, 2. * np.sin(min(r, np.pi) / 4.))
+
+        return [np.unique(np.asarray(h, dtype=np.intp) % self._n) for h in hits]
+
+    @staticmethod
+    def _chord2angle(chord):
+        """
+        Converts chord distance between unit quaternions to rotation angle, radians.
+        """
+
+        return 4. * np.arcsin(np.clip(chord / 2., 0., 1.))
+
+
+def interp_quat(x:      'numpy.ndarray, (M,)',
+                xp:     'numpy.ndarray, (N,)',
+                fp:     'numpy.ndarray, (N,4)',
+                method: str = 'slerp'):
+    """
+    Interpolates an attitude history (scalar-first quaternions) to new domain points, like numpy.interp does for
+    scalar data.  Works on the whole array at once; no Rotation objects are built per sample.
+
+    :param x:      points at which to evaluate; values outside of xp are clamped to the end attitudes
+    :param xp:     monotonically increasing domain of the attitude history
+    :param fp:     (N,4) array of quaternions at xp (or a RotationArray)
+    :param method: 'slerp' (piecewise geodesic) or 'squad' (smooth spherical cubic through the samples)
+
+    :return:       (M,4) numpy.ndarray of unit quaternions
+
+    NOTE: sign flips between neighboring samples are removed before interpolating, so the shortest path is always
+          taken; the sign of the returned quaternions follows the first sample.
+    """
+
+    x  = np.asarray(x, dtype=np.float64)
+    xp = np.asarray(xp, dtype=np.float64)
+    q  = np.array(fp.quat if isinstance(fp, RotationArray) else fp, dtype=np.float64)
+
+    if q.ndim != 2 or q.shape[1] != 4 or len(q) != len(xp):
+        raise ValueError('fp must be an (N,4) array of quaternions matching the length of xp')
+    q = RotationArray._normalize(q)
+    if len(xp) == 1:
+        return np.repeat(q, len(x), axis=0)
+
+    q = RotationArray._continuous(q)
+
+    # bracketing sample and fraction for each query point
+    lo = np.clip(np.searchsorted(xp, x, side='right') - 1, 0, len(xp) - 2)
+    h  = np.clip((x - xp[lo]) / (xp[lo + 1] - xp[lo]), 0., 1.)
+
+    if method == 'slerp':
+        return RotationArray._slerp(q[lo], q[lo + 1], h)
+    elif method == 'squad':
+        # inner control points: s_i = q_i exp(-(log(q_i^-1 q_i+1) + log(q_i^-1 q_i-1))/4); ends are their own
+        qinv = q * np.array((1., -1., -1., -1.))
+        s    = q.copy()
+        lnext = RotationArray._log(RotationArray._mult(qinv[1:-1], q[2:]))
+        lprev = RotationArray._log(RotationArray._mult(qinv[1:-1], q[:-2]))
+        s[1:-1] = RotationArray._mult(q[1:-1], RotationArray._exp(-(lnext + lprev) / 4.))
+
+        return RotationArray._slerp(RotationArray._slerp(q[lo], q[lo + 1], h),
+                                    RotationArray._slerp(s[lo], s[lo + 1], h),
+                                    2. * h * (1. - h))
+    else:
+        raise ValueError("Interpolation method must be 'slerp' or 'squad', not '{}'".format(method))
+
+
+# --- euler sequence conversion engine --------------------------------------------------------------------------------
+#
+# Sequences are intrinsic (body axis) rotations, named in the order applied: 'zyx' is yaw about z, then pitch about the
+# new y, then roll about the newest x, i.e. q = qz(a0)*qy(a1)*qx(a2), as in Rotation.fromEulerZYX.  All 12
+# Tait-Bryan/proper sequences go through the same code, parameterized per sequence by the table below.  Angles are
+# recovered with the direct method of Bernardes & Viollet, "Quaternion to Euler angles conversion: A direct, general
+# and computationally efficient method" (2022), which works on the extrinsic (reversed) sequence.
+
+def _euler_table():
+    """
+    Builds the per-sequence coefficient table.
+
+    :return: dict of sequence -> (axes, (i, j, k), proper, sign), where axes are the quaternion component indices (1-3)
+             of the intrinsic rotations, (i, j, k) the permutation used to read the angles back, proper whether the
+             sequence repeats its first axis, and sign the parity of (i, j, k)
+    """
+
+    table = {}
+    for a in 'xyz':
+        for b in 'xyz':
+            for c in 'xyz':
+                if a == b or b == c:
+                    continue
+                axes = tuple('xyz'.index(ax) + 1 for ax in (a, b, c))
+                i, j, k = axes[::-1]
+                proper  = i == k
+                if proper:
+                    k = 6 - i - j
+                sign = (i - j) * (j - k) * (k - i) // 2
+                table[a + b + c] = (axes, (i, j, k), proper, sign)
+
+    return table
+
+EULER_SEQS = _euler_table()
+
+GIMBAL_TOL = 1e-7  # radians from the singular middle angle at which a sample is considered gimbal locked
+
+
+def _euler_entry(seq: str):
+    """
+    Looks up a sequence in the conversion table.
+    """
+
+    try:
+        return EULER_SEQS[seq.lower()]
+    except (KeyError, AttributeError):
+        raise ValueError("Euler sequence must be one of {}, not '{}'".format(sorted(EULER_SEQS), seq))
+
+def euler2quat(angles: '(...,3) array-like',
+               seq:    str = 'zyx',
+               units:  str = 'rad'):
+    """
+    Converts euler angles to scalar-first quaternions.
+
+    :param angles: angles in the order of seq; a 3-element iterable or an (N,3) array
+    :param seq:    intrinsic rotation sequence, e.g. 'zyx', 'xyz', 'zxz'
+    :param units:  'rad' or 'deg'
+
+    :return:       (...,4) numpy.ndarray
+    """
+
+    axes = _euler_entry(seq)[0]
+    ang  = np.asarray(angles, dtype=np.float64)
+    if ang.shape[-1:] != (3,):
+        raise ValueError('Euler angles must be given as a (...,3) array')
+    if units == 'deg':
+        ang = ang * Rotation.PIOVER180
+
+    half = ang / 2.
+    c    = np.cos(half)
+    s    = np.sin(half)
+
+    # chain the three single-axis quaternions
+    q = np.zeros(ang.shape[:-1] + (4,))
+    q[..., 0]       = c[..., 0]
+    q[..., axes[0]] = s[..., 0]
+    for n in (1, 2):
+        qa = np.zeros_like(q)
+        qa[..., 0]       = c[..., n]
+        qa[..., axes[n]] = s[..., n]
+        q = RotationArray._mult(q, qa)
+
+    return q.reshape(ang.shape[:-1] + (4,))
+
+def _quat2euler(quat: '(...,4) array-like',
+                seq:  str):
+    """
+    Converts scalar-first quaternions to euler angles, radians, and flags gimbal lock.
+
+    :return: (...,3) numpy.ndarray of angles, (...) boolean numpy.ndarray; in gimbal lock the first angle is set to 0
+    """
+
+    axes, (i, j, k), proper, sign = _euler_entry(seq)
+
+    q = np.asarray(quat, dtype=np.float64)
+    if q.shape[-1:] != (4,):
+        raise ValueError('Quaternions must be given as a (...,4) array')
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+    # permute quaternion elements
+    if proper:
+        a = q[..., 0]
+        b = q[..., i]
+        c = q[..., j]
+        d = q[..., k] * sign
+    else:
+        a = q[..., 0] - q[..., j]
+        b = q[..., i] + q[..., k] * sign
+        c = q[..., j] + q[..., 0]
+        d = q[..., k] * sign - q[..., i]
+
+    ang = np.empty(q.shape[:-1] + (3,))
+    ang[..., 1] = 2. * np.arctan2(np.hypot(c, d), np.hypot(a, b))
+
+    # singular when the middle angle is 0 or pi; zero the first angle and put the whole rotation in the third
+    zero = np.abs(ang[..., 1]) <= GIMBAL_TOL
+    pi   = np.abs(ang[..., 1] - np.pi) <= GIMBAL_TOL
+    lock = zero | pi
+
+    half_sum  = np.arctan2(b, a)
+    half_diff = np.arctan2(d, c)
+
+    # angles of the extrinsic sequence are reversed relative to the intrinsic one
+    ang[..., 2] = half_sum - half_diff
+    ang[..., 0] = half_sum + half_diff
+    ang[..., 2] = np.where(zero, 2. * half_sum, np.where(pi, -2. * half_diff, ang[..., 2]))
+    ang[..., 0] = np.where(lock, 0., ang[..., 0])
+
+    if not proper:
+        ang[..., 0] *= sign
+        ang[..., 1] -= np.pi / 2.
+
+    # wrap to [-pi, pi]
+    ang = np.where(ang < -np.pi, ang + 2 * np.pi, np.where(ang > np.pi, ang - 2 * np.pi, ang))
+
+    return ang, lock
+
+def quat2euler(quat:  '(...,4) array-like',
+               seq:   str = 'zyx',
+               units: str = 'rad'):
+    """
+    Converts scalar-first quaternions to euler angles.  In gimbal lock (see gimbal_lock) the first angle is set to 0
+    and the third carries the whole rotation about the locked axis.
+
+    :param quat:  a 4-element iterable or an (N,4) array
+    :param seq:   intrinsic rotation sequence, e.g. 'zyx', 'xyz', 'zxz'
+    :param units: 'rad' or 'deg'
+
+    :return:      (...,3) numpy.ndarray of angles in the order of seq
+    """
+
+    ang = _quat2euler(quat, seq)[0]
+
+    return ang / Rotation.PIOVER180 if units == 'deg' else ang
+
+def gimbal_lock(quat: '(...,4) array-like',
+                seq:  str = 'zyx'):
+    """
+    Flags the quaternions whose euler angles, in the given sequence, are singular (middle angle of 0 or pi for proper
+    sequences, +/-pi/2 for Tait-Bryan sequences), to within GIMBAL_TOL.
+
+    :return: (...) boolean numpy.ndarray
+    """
+
+    return _quat2euler(quat, seq)[1]
+
+def quat2dcm(quat: '(...,4) array-like'):
+    """
+    Converts scalar-first quaternions to DCMs (see Rotation.dcm).
+
+    :return: (...,3,3) numpy.ndarray
+    """
+
+    q = np.asarray(quat, dtype=np.float64)
+
+    return RotationArray(q.reshape(-1, 4)).dcm.reshape(q.shape[:-1] + (3, 3))
+
+def dcm2quat(dcm: '(...,3,3) array-like'):
+    """
+    Converts DCMs (see Rotation.dcm) to scalar-first quaternions, with a non-negative scalar.  Uses Shepperd's method:
+    each sample is solved from whichever of the scalar/vector components is largest, for numerical stability.
+
+    :return: (...,4) numpy.ndarray
+    """
+
+    d = np.asarray(dcm, dtype=np.float64)
+    if d.shape[-2:] != (3, 3):
+        raise ValueError('DCMs must be given as a (...,3,3) array')
+
+    tr = d[..., 0, 0] + d[..., 1, 1] + d[..., 2, 2]
+    s12 = d[..., 1, 2] - d[..., 2, 1]
+    s20 = d[..., 2, 0] - d[..., 0, 2]
+    s01 = d[..., 0, 1] - d[..., 1, 0]
+    p01 = d[..., 0, 1] + d[..., 1, 0]
+    p02 = d[..., 0, 2] + d[..., 2, 0]
+    p12 = d[..., 1, 2] + d[..., 2, 1]
+
+    # 4*q*q_pivot for each choice of pivot component (rows), scalar first (columns)
+    cand = np.stack((np.stack((1. + tr, s12, s20, s01), axis=-1),
+                     np.stack((s12, 1. + 2. * d[..., 0, 0] - tr, p01, p02), axis=-1),
+                     np.stack((s20, p01, 1. + 2. * d[..., 1, 1] - tr, p12), axis=-1),
+                     np.stack((s01, p02, p12, 1. + 2. * d[..., 2, 2] - tr), axis=-1)), axis=-2)
+
+    pivot = np.argmax(np.stack((tr, d[..., 0, 0], d[..., 1, 1], d[..., 2, 2]), axis=-1), axis=-1)
+    q = np.take_along_axis(cand, pivot[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+    return np.where(q[..., :1] < 0., -q, q)
+
+def euler2dcm(angles: '(...,3) array-like',
+              seq:    str = 'zyx',
+              units:  str = 'rad'):
+    """
+    Converts euler angles to DCMs.  See euler2quat.
+
+    :return: (...,3,3) numpy.ndarray
+    """
+
+    return quat2dcm(euler2quat(angles, seq, units))
+
+def dcm2euler(dcm:   '(...,3,3) array-like',
+              seq:   str = 'zyx',
+              units: str = 'rad'):
+    """
+    Converts DCMs to euler angles.  See quat2euler.
+
+    :return: (...,3) numpy.ndarray
+    """
+
+    return quat2euler(dcm2quat(dcm), seq, units)
@@ -1,85 +1,268 @@
-import pandas as pd
 import numpy as np
-import scipy.io
 
-from collections import Iterable
-from os import listdir, mkdir, makedirs
-from os.path import isdir, join
-from shutil import rmtree, move
-from linecache import getline
+import json
+import struct
 
-# TODO: create a unified class which will:
-#           allow reading MAT, DAT, CSV, etc
-#           allow indexing by column name or column number
-#           allow writing to any format
-#           facilitate easy plotting/introspection
-# TODO: also, make a better "load" function which can figure out what to do on its own
+from glob import glob, escape as glob_escape
+from hashlib import sha1
+from itertools import islice
+from os import W_OK, access, environ, fstat, listdir, mkdir, makedirs, rename, scandir, stat, utime
+from os.path import abspath, basename, dirname, expanduser, isdir, isfile, ismount, join, realpath, splitext
+from shutil import copymode, rmtree
+from tempfile import mkdtemp
+from threading import Thread
+from uuid import uuid4
+
+# binary columnar cache for text tables (see _load_table)
+CACHE_DIR      = environ.get('GNCTOOLS_CACHE', join(expanduser('~'), '.cache', 'gnctools', 'tables'))
+CACHE_MAXBYTES = 20 * 2**30  # LRU-evicted down to this size
+CACHE_HASHLEN  = 2**20       # bytes at the beginning of the source file hashed to detect changes
+
+# TODO: make Dataset facilitate easy plotting/introspection
 
 def loadIntoArray(fname:      str,
                   headerline: bool = True,
-                  verbose:    bool = True):
+                  verbose:    bool = True,
+                  cache:      bool = True):
     """
-    Loads the contents of the file into a numpy.ndarray. Returns the array and header line, if present.
+    Loads the contents of the file into a numpy.ndarray. Returns the array and header line, if present.  Uses the
+    binary cache unless cache is False (see _load_table).
     """
     if verbose:
         print('Loading file ' + fname + ' ...')
 
-    if headerline:
-        df = pd.read_csv(filepath_or_buffer = fname,
-                         dtype = np.float64,
-                         delim_whitespace = True)
-        return df.values, df.columns #TODO: this is returning df.columns as an Index object, need to make it just a list
-    else:
-        df = pd.read_csv(filepath_or_buffer = fname,
-                         header = None,
-                         dtype = np.float64,
-                         delim_whitespace = True)
-        return df.values, []
+    cols, headers = _load_table(fname, cache, headerlen=1 if headerline else 0, commentchar='')
+
+    return np.column_stack(list(cols.values())), (headers if headerline else [])
+
+def loadtxt_iter(fname:       str,
+                 cols:        'str, int, or iterable of str/int' = None,
+                 chunksize:   int  = 65536,
+                 headerlen:   int  = 1,
+                 commentchar: str  = '#',
+                 delimiter:   str  = None,
+                 dtype:       type = float):
+    """
+    Streams a delimited text table in fixed-size chunks, parsing only the requested columns.  The header is read once;
+    the full file is never held in memory.
+
+    :param fname:       filename
+    :param cols:        column(s) to read, by header name or column number; all columns if not specified
+    :param chunksize:   number of rows per chunk
+    :param headerlen:   number of rows at the beginning of the file in which to expect a header (column names taken
+                        from the last of these)
+    :param commentchar: comment char to strip from beginning of header lines; data lines starting with it are skipped
+    :param delimiter:   string separator; contiguous whitespace by default
+    :param dtype:       data type for np.arrays; float by default
+
+    :return: generator of dicts with data stored by column name (by column number if headerlen == 0), in the order
+             requested
+    """
+
+    with open(fname) as f:
+        headers = None
+        for ii, line in zip(range(headerlen), f):
+            if ii == headerlen - 1:
+                headers = [h.strip() for h in line.lstrip(commentchar).split(sep=delimiter)]
+
+        # resolve columns to read; without a header, all columns are counted from the first data block
+        if cols is None:
+            usecols = None if headers is None else list(range(len(headers)))
+        else:
+            usecols = []
+            for c in ((cols,) if isinstance(cols, (str, int)) else cols):
+                if isinstance(c, str):
+                    if headers is None or c not in headers:
+                        raise ValueError("The '{}' column requested is not present in {}".format(c, fname))
+                    usecols.append(headers.index(c))
+                elif isinstance(c, int):
+                    usecols.append(c)
+                else:
+                    raise ValueError("Desired column(s) cannot be specified as type {}".format(type(c)))
+
+        empty = True
+        for dat in _iter_blocks(f, usecols, chunksize, delimiter, dtype, commentchar):
+            if not len(dat):
+                continue  # blank or comment lines only, so no width to take
+            if usecols is None:
+                usecols = list(range(dat.shape[1]))
+            keys  = usecols if headers is None else [headers[c] for c in usecols]
+            empty = False
+
+            yield {k: col for k, col in zip(keys, dat.T)}
+
+        # no data rows: the columns are still known from the header
+        if empty and usecols is not None:
+            keys = usecols if headers is None else [headers[c] for c in usecols]
+            yield {k: np.empty(0, dtype=dtype) for k in keys}
+
+def _iter_blocks(f:           'open text file',
+                 usecols:     'list of int',
+                 chunksize:   int,
+                 delimiter:   str,
+                 dtype:       type,
+                 commentchar: str):
+    """
+    Parses the rest of an open text table, chunksize lines at a time.  Only the columns in usecols (all if None) are
+    converted.
+
+    :return: generator of 2-D arrays, one row per line
+    """
+
+    while True:
+        lines = list(islice(f, chunksize))
+        if not lines:
+            break
+
+        yield np.loadtxt(lines, delimiter=delimiter, usecols=usecols, dtype=dtype, ndmin=2,
+                         comments=commentchar or None)
+
+def _collect(chunks: 'iterable of dicts'):
+    """
+    Concatenates the chunks streamed by loadtxt_iter into full columns.
+
+    :return: dict of columns, list of column names
+    """
+
+    parts = {}
+    for chunk in chunks:
+        for k, col in chunk.items():
+            parts.setdefault(k, []).append(col)
+
+    cols = {k: np.concatenate(p) for k, p in parts.items()}
+
+    return cols, list(cols.keys())
+
+def _load_table(fname: str,
+                cache: bool,
+                **kwargs):
+    """
+    Loads a full text table (see loadtxt_iter for kwargs) through the binary columnar cache.
+
+    The first load of a file writes each column to a .npy file plus a manifest.json in an entry of CACHE_DIR.  Later
+    loads memory-map the .npy files (copy-on-write) instead of parsing the text, as long as the source file's size,
+    mtime and leading CACHE_HASHLEN bytes are unchanged.  Entries are least-recently-used evicted down to
+    CACHE_MAXBYTES.
+
+    :param fname: filename
+    :param cache: if False, parse the file without reading or writing the cache
+
+    :return: dict of columns, list of column names
+    """
+
+    if not cache:
+        return _collect(loadtxt_iter(fname, **kwargs))
+
+    # the parse options (but not the chunking) change the result, so they are part of the key
+    params = {k: kwargs.get(k) for k in ('headerlen', 'commentchar', 'delimiter')}
+    params['dtype'] = np.dtype(kwargs.get('dtype', float)).str
+    src   = abspath(fname)
+    key   = sha1(json.dumps([src, params], sort_keys=True).encode()).hexdigest()
+    entry = join(CACHE_DIR, key)
+
+    st  = stat(src)
+    sig = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': _hash_prefix(src)}
+
+    # hit
+    try:
+        with open(join(entry, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['source'] == sig:
+            utime(join(entry, 'manifest.json'))  # mark as recently used
+            # copy-on-write, so cached columns are writable like parsed ones; edits never reach the cache
+            cols = {k: np.load(join(entry, fn), mmap_mode='c') for k, fn in zip(manifest['columns'], manifest['files'])}
+            return cols, list(cols.keys())
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # miss: parse, then publish the new entry with an atomic rename
+    cols, headers = _collect(loadtxt_iter(fname, **kwargs))
+
+    makedirs(CACHE_DIR, exist_ok=True)
+    tmp = mkdtemp(prefix='.tmp', dir=CACHE_DIR)
+    files = ['col{}.npy'.format(ii) for ii in range(len(headers))]
+    for fn, h in zip(files, headers):
+        np.save(join(tmp, fn), cols[h])
+    with open(join(tmp, 'manifest.json'), 'w') as f:
+        json.dump({'path': src, 'params': params, 'source': sig, 'columns': headers, 'files': files}, f)
+
+    rmtree(entry, ignore_errors=True)  # stale
+    try:
+        rename(tmp, entry)
+    except OSError:
+        rmtree(tmp, ignore_errors=True)  # another process published it first
+
+    _evict_lru(CACHE_DIR, CACHE_MAXBYTES)
+
+    return cols, headers
+
+def _hash_prefix(fname: str):
+    """
+    Returns the sha1 hex digest of the first CACHE_HASHLEN bytes of the file.
+    """
+
+    with open(fname, 'rb') as f:
+        return sha1(f.read(CACHE_HASHLEN)).hexdigest()
+
+def _evict_lru(root:     str,
+               maxbytes: int):
+    """
+    Deletes the least recently used entries (subdirectories) of root until their total size is within maxbytes.
+    Recency is the newest mtime of the files in an entry.
+
+    :return: nothing
+    """
+
+    entries = []
+    for name in listdir(root):
+        path = join(root, name)
+        if name.startswith('.tmp') or not isdir(path):
+            continue
+        try:
+            files = [stat(join(path, fn)) for fn in listdir(path)]
+        except OSError:
+            continue  # being evicted by someone else
+        entries.append((max([f.st_mtime for f in files], default=0.), sum(f.st_size for f in files), path))
+
+    total = sum(e[1] for e in entries)
+    for _, size, path in sorted(entries):
+        if total <= maxbytes:
+            break
+        rmtree(path, ignore_errors=True)
+        total -= size
 
 def loadtxt_col(fname:       str,
-                col:         'str or iterable of str',
+                col:         'str, int, or iterable of str/int',
                 **kwargs):
     """
-    Wraps io.loadtxt, loading only the column(s) of interest.
+    Loads only the column(s) of interest; see loadtxt_iter.
 
     :param fname:       filename
-    :param col:         the string header of the desired column of data, or a tuple containing the headers for multiple
-                        desired columns
+    :param col:         the string header (or column number) of the desired column of data, or a tuple containing the
+                        headers/numbers for multiple desired columns
 
-    --- kwargs to pass through to loadtxt():
+    --- kwargs to pass through to loadtxt_iter():
     :param delimiter:   string separator; contiguous whitespace by default
     :param headerlen:   number of rows at the beginning of the file in which to expect a header
     :param commentchar: comment char to strip from beginning of header lines
 
-    :return: an np.array containing the data from column requested
-
-    TODO: add ability to specify column number
-    TODO: refactor to save cpu time (maybe using np.loadtxt kwarg 'usecols'), otherwise delete this
-    TODO: move this into loadtxt, just add 'col' kwarg
+    :return: an np.array containing the data from column requested, or a tuple of them
     """
 
-    dat, h = loadtxt(fname, **kwargs)
+    dat, h = _collect(loadtxt_iter(fname, cols=col, **kwargs))
 
-    if isinstance(col, str):
-        if not col in h:
-            raise ValueError("The '{}' column requested is not present in {}".format(col, fname))
-        else:
-            return dat[col]
-    elif isinstance(col, Iterable):
-        if not set(col).issubset(set(h)):
-            raise ValueError("One or more columns requested are not present in {}".format(fname))
-        else:
-            return tuple([dat[c] for c in col])
+    if isinstance(col, (str, int)):
+        return dat[h[0]]
     else:
-        raise ValueError("Desired column(s) cannot be specified as type {}".format(type(col)))
+        return tuple([dat[c] for c in h])
 
 def loadtxt(fname:       str,
             headerlen:   int  = 1,
             commentchar: str  = '#',
             **kwargs):
     """
-    Wraps numpy.loadtxt, returning the data in a dict with the column names as keys.  Assumes single header line by
-    default.
+    Loads a delimited text table, returning the data in a dict with the column names as keys.  Assumes single header
+    line by default.  See loadtxt_iter.
 
     :param   fname:       filename
     :param   headerlen:   number of rows at the beginning of the file in which to expect a header
@@ -88,36 +271,23 @@ def loadtxt(fname:       str,
     -- kwargs:
                 delimiter:   string separator; contiguous whitespace by default
                 dtype:       data type for np.arrays; float by default
+                chunksize:   number of rows parsed at a time
+                cache:       if False, don't use the binary cache (see _load_table); True by default
 
-    :return: if rtnheader and headerlen >= 1: see below + list of column headers (2-tuple containing these)
-
-             if headerlen >= 1: a dict with data stored by column name (assumes last line of header has column name info)
+    :return: if headerlen >= 1: a dict with data stored by column name (assumes last line of header has column name
+             info) + list of column headers (2-tuple containing these)
 
-             if headerlen == 0: a 2-D array
+             if headerlen == 0: a 2-D array + None
 
     """
 
-    dat = np.loadtxt(fname, skiprows=headerlen, **kwargs)
-
-    if 'delimiter' in kwargs.keys():
-        delim = kwargs['delimiter']
-    else:
-        delim = None
+    cache = kwargs.pop('cache', True)
+    cols, headers = _load_table(fname, cache, headerlen=headerlen, commentchar=commentchar, **kwargs)
 
     if headerlen >= 1:
-        with open(fname) as f:
-            for ii, line in enumerate(f):
-                if ii == headerlen - 1:
-                    break
-        headers = [h.strip() for h in line.lstrip(commentchar).split(sep=delim)]
-    else:
-        headers   = False
-
-    if not headers:
-        return dat, None
+        return cols, headers
     else:
-        datdict = {h : col for h, col in zip(headers, dat.T)}
-        return datdict, headers
+        return np.column_stack(list(cols.values())), None
 
 def savetxt(fname:    str,
             datadict: dict,
@@ -142,28 +312,158 @@ def savetxt(fname:    str,
 def loadmat(fname:     str,
             mdict:     dict = None,
             appendmat: bool = True,
+            mmap:      bool = False,
             **kwargs):
     """
     Wrapper function for scipy.io.loadmat which uses numpy.squeeze to remove singular dimensions from arrays
     in the dict returned.  Also returns a np.array if the mat file only contains 1 variable.
 
+    With mmap, the file's variables are indexed without reading their data (see _index_mat5), and uncompressed numeric
+    arrays of a MAT v5 file are returned as read-only numpy.memmap views; anything else (compressed, complex, sparse,
+    cell, struct, char, or stored in a narrower type) is loaded through scipy.io.loadmat as usual.  Pass
+    variable_names to load only those.
+
     API doc: http://docs.scipy.org/doc/scipy-0.16.0/reference/generated/scipy.io.loadmat.html
     """
 
     NONDATAKEYS = ('__version__', '__globals__', '__header__')
 
-    mat = scipy.io.loadmat(fname, mdict, appendmat, **kwargs)
+    import scipy.io
+
+    if mmap:
+        mat = _loadmat_mmap(fname, appendmat, **kwargs)
+        if mdict is not None:
+            mdict.update(mat)
+    else:
+        mat = scipy.io.loadmat(fname, mdict, appendmat, **kwargs)
 
     keys = [k for k in mat.keys() if not k in NONDATAKEYS]
 
     for k in keys:
-        mat[k] = np.squeeze(mat[k])
+        if isinstance(mat[k], np.memmap):
+            mat[k] = mat[k].reshape([d for d in mat[k].shape if d != 1]) # same as squeeze, but keeps the memmap
+        else:
+            mat[k] = np.squeeze(mat[k])
 
     if len(keys) == 1:
         return mat[keys[0]]
     else:
         return mat
 
+# MAT v5 data types (miXXX) -> numpy types, and numeric array classes (mxXXX) -> the miXXX type that stores them
+# without conversion
+_MI_TYPES = {1: 'i1', 2: 'u1', 3: 'i2', 4: 'u2', 5: 'i4', 6: 'u4', 7: 'f4', 9: 'f8', 12: 'i8', 13: 'u8'}
+_MX_NATIVE = {6: 9, 7: 7, 8: 1, 9: 2, 10: 3, 11: 4, 12: 5, 13: 6, 14: 12, 15: 13}
+
+def _loadmat_mmap(fname:          str,
+                  appendmat:      bool = True,
+                  variable_names: 'iterable of str' = None,
+                  **kwargs):
+    """
+    loadmat(mmap=True) implementation.
+
+    :return: dict of variable name -> numpy.memmap (or whatever scipy.io.loadmat returns, for the fallbacks)
+    """
+
+    import scipy.io
+
+    if appendmat and not isfile(fname) and not fname.endswith('.mat'):
+        fname += '.mat'
+
+    index = _index_mat5(fname)
+    if index is None:  # not v5 (e.g. v4, or v7.3 which scipy will reject)
+        return scipy.io.loadmat(fname, None, False, variable_names=variable_names, **kwargs)
+
+    names    = list(index) if variable_names is None else [n for n in variable_names if n in index]
+    mat      = {}
+    fallback = []
+    for name in names:
+        offset, dtype, shape = index[name]
+        if dtype is None:
+            fallback.append(name)
+        elif 0 in shape:
+            mat[name] = np.empty(shape, dtype=dtype)
+        else:
+            mat[name] = np.memmap(fname, dtype=dtype, mode='r', offset=offset, shape=shape, order='F')
+
+    if fallback:
+        mat.update(scipy.io.loadmat(fname, None, False, variable_names=fallback, **kwargs))
+
+    with open(fname, 'rb') as f:
+        header = f.read(116).rstrip(b'\x00 ')
+
+    mat = {name: mat[name] for name in names if name in mat}
+    mat.update({'__header__': header, '__version__': '1.0', '__globals__': []})
+    return mat
+
+def _index_mat5(fname: str):
+    """
+    Walks the top-level data elements of a MAT v5 file, reading only element headers.
+
+    :return: dict of variable name -> (data offset, numpy dtype, dims) where dtype is None if the variable can't be
+             memory-mapped, or None if the file isn't a MAT v5 file
+    """
+
+    index      = {}
+    compressed = False
+    with open(fname, 'rb') as f:
+        head = f.read(128)
+        if len(head) < 128 or head[124:126] not in (b'\x00\x01', b'\x01\x00'):
+            return None
+        end = '<' if head[126:128] == b'IM' else '>'
+
+        def tag():
+            # returns (type, nbytes, small element data or None)
+            raw = f.read(8)
+            mtype, nbytes = struct.unpack(end + 'II', raw)
+            if mtype >> 16:  # small data element: type and size packed in 4 bytes, data in the other 4
+                return mtype & 0xFFFF, mtype >> 16, raw[4:4 + (mtype >> 16)]
+            return mtype, nbytes, None
+
+        size = fstat(f.fileno()).st_size
+        pos  = 128
+        while pos + 8 <= size:
+            f.seek(pos)
+            mtype, nbytes, _ = tag()
+            nextpos = pos + 8 + nbytes
+
+            if mtype == 15:  # miCOMPRESSED; name is inside the compressed stream, see below
+                compressed = True
+            elif mtype == 14:  # miMATRIX
+                tag()  # array flags
+                flags = struct.unpack(end + 'II', f.read(8))
+                mxclass = flags[0] & 0xFF
+                cmplx   = flags[0] & 0x0800
+
+                _, dnbytes, _ = tag()  # dimensions
+                dims = struct.unpack(end + '{}i'.format(dnbytes // 4), f.read(dnbytes))
+                f.seek(-dnbytes % 8, 1)
+
+                _, nnbytes, small = tag()  # name
+                if small is None:
+                    name = f.read(nnbytes).decode('latin1')
+                    f.seek(-nnbytes % 8, 1)
+                else:
+                    name = small.decode('latin1')
+
+                dtype = None
+                if mxclass in _MX_NATIVE and not cmplx:
+                    dtype_mi, dbytes, small = tag()
+                    if dtype_mi == _MX_NATIVE[mxclass] and small is None:
+                        dtype = np.dtype(end + _MI_TYPES[dtype_mi])
+                index[name] = (f.tell(), dtype, dims)
+
+            pos = nextpos + (-nextpos % 8 if mtype == 14 else 0)
+
+    # let scipy list the compressed variables; they're loaded through it too
+    if compressed:
+        import scipy.io
+
+        for name, shape, cls in scipy.io.whosmat(fname):
+            index.setdefault(name, (None, None, None))
+
+    return index
+
 def writeArrayToFile(fname:   str,                 # name & location to save
                      data:    '2D numpy.ndarray',  # matrix of data to write
                      header:  list = (),           # header line
@@ -175,6 +475,8 @@ def writeArrayToFile(fname:   str,                 # name & location to save
     if verbose:
         print('Writing file ' + fname + ' ...')
 
+    import pandas as pd
+
     df = pd.DataFrame(data)
     df.to_csv(path_or_buf  = fname,
               sep          = ' ',
@@ -182,24 +484,38 @@ def writeArrayToFile(fname:   str,                 # name & location to save
               header       = header,
               index        = False)
 
-def makeCleanPath(path: str):
+def makeCleanPath(path:       str,
+                  keep:       int  = 1,
+                  background: bool = True):
     """
     Creates a clean path at the location specified.  Makes sure the location (1) exists, and
-    (2) doesn't have old files in it.  By default, if the directory exists and is not empty,
-    creates the sub directory named by the variable PREVDIR in which to store the prior contents.
-    It also creates a file WARNFIL with a warning about the fragility of the directory.
-
-    :param   path: the path to be created/emptied
+    (2) doesn't have old files in it.  By default, if the directory exists, its prior contents
+    are kept in the sub directory named by the variable PREVDIR, whose own PREVDIR holds the
+    generation before, and so on, keep generations deep.  It also creates a file WARNFIL with a
+    warning about the fragility of the directory.
+
+    :param   path:       the path to be created/emptied
+    :param   keep:       number of previous generations to keep (0 to keep none)
+    :param   background: delete the generation falling out of retention in a background thread
     :return  None
 
     NOTES:
     ------
     * Useful for quickly making a directory to dump plots, datafiles, etc.
     * PREV directory is for quick oh shit prevention; should not be used in lieu of version control
+    * Takes constant time however many files the directory holds: the directory itself is renamed
+      aside (to a hidden sibling of path) and then into a freshly made path as the new PREVDIR, and
+      the stale generation is renamed aside to be deleted.  path is resolved first, so a symlinked
+      path stays a symlink.  Where path can't be renamed (a mount point, or a parent that isn't
+      writable), its top-level entries are renamed one by one into a hidden rotation directory
+      inside path instead.  A reset interrupted part way is completed by the next call, so prior
+      contents are never half-moved.
     """
 
-    PREVDIR = '_@prev'
-    WARNFIL = '_@autogen_warning.txt'
+    PREVDIR  = '_@prev'
+    WARNFIL  = '_@autogen_warning.txt'
+    ROTPFX   = '.@rotating'  # prefix of the rotation directory inside path, where path can't be renamed
+    TRASHPFX = '.@trash'     # prefix of the directories being deleted inside path, likewise
     MSG = '''
           WARNING:\n
           This directory and contents were generated by a script which routinely deletes the \n
@@ -207,18 +523,401 @@ def makeCleanPath(path: str):
           destroyed forever if the script is re-run.
           '''
 
+    path    = realpath(path)
+    parent  = dirname(path)
+    hidden  = join(parent, '.' + basename(path))  # prefix of the rotating and trash siblings
     prevdir = join(path, PREVDIR)
+    trash   = []
+
+    # finish any reset interrupted between renames
+    for rot in glob(glob_escape(hidden) + '_@rotating*'):
+        if not isdir(path):
+            rename(rot, path)
+        elif not isdir(prevdir):
+            rename(rot, prevdir)
+        else:
+            trash.append(rot)
 
     if not isdir(path):
         makedirs(path)
+
+    inplace = ismount(path) or not access(parent, W_OK)
+    aside   = lambda: join(path, TRASHPFX + uuid4().hex) if inplace else '{}_@trash{}'.format(hidden, uuid4().hex)
+
+    if not inplace:
+        rot = []
+        with scandir(path) as it:  # stops at the first entry, so costs nothing however many files path holds
+            changed = any(entry.name not in (PREVDIR, WARNFIL) for entry in it)
+    else:
+        ls      = set(listdir(path))
+        rot     = sorted(name for name in ls if name.startswith(ROTPFX))  # left by an interrupted in-place reset
+        new     = {name for name in ls if not name.startswith((ROTPFX, TRASHPFX))} - {PREVDIR}
+        changed = rot or not new <= {WARNFIL}
+
+    if changed:  # nothing new to keep otherwise
+        if not inplace:
+            # the whole directory becomes the new PREVDIR, in three renames
+            rot = '{}_@rotating{}'.format(hidden, uuid4().hex)
+            rename(path, rot)
+            mkdir(path)
+            copymode(rot, path)
+        else:
+            for extra in rot[1:]:  # only from concurrent resets; one is finished, the rest dropped
+                trash.append(aside())
+                rename(join(path, extra), trash[-1])
+            rot = join(path, rot[0]) if rot else mkdtemp(prefix=ROTPFX, dir=path)
+
+            # the current contents, then the old PREVDIR beneath them, become the new PREVDIR
+            for name in new:
+                rename(join(path, name), join(rot, name))
+            if isdir(prevdir):
+                rename(prevdir, join(rot, PREVDIR))
+
+        if keep > 0:
+            rename(rot, prevdir)
+        else:
+            trash.append(aside())
+            rename(rot, trash[-1])
+
+    # the generation past the retention moves out of the tree
+    stale = join(path, *[PREVDIR] * (keep + 1))
+    if isdir(stale):
+        trash.append(aside())
+        rename(stale, trash[-1])
+
+    # also sweep trash left by earlier calls that didn't get to finish deleting it
+    trash = set(trash) | set(glob(glob_escape(hidden) + '_@trash*'))
+    if inplace:
+        trash |= {join(path, name) for name in ls if name.startswith(TRASHPFX)}
+    if background and trash:
+        Thread(target=_rmtrees, args=(sorted(trash),), name='makeCleanPath').start() # non-daemon: finishes before exit
     else:
-        ls = set(listdir(path)) # get list of files/dirs
-        if isdir(prevdir):
-            ls.discard(PREVDIR) # don't include prevdir in move
-            rmtree(prevdir)
-        mkdir(prevdir)          # make a new empty prevdir
-        for name in ls:         # move the old files into prevdir
-            move(join(path, name), join(prevdir, name))
+        _rmtrees(trash)
 
     with open(join(path, WARNFIL), 'w') as f:
         f.write(MSG)
+
+def _rmtrees(paths: 'iterable of str'):
+    """
+    Deletes directory trees; ones already gone (e.g. deleted by a concurrent sweep) are skipped.
+    """
+
+    for p in paths:
+        rmtree(p, ignore_errors=True)
+
+
+# --- unified loader ---------------------------------------------------------------------------------------------------
+
+_READERS = [] # (reader class, extensions, (offset, magic bytes) or None), in order of registration
+_WRITERS = {} # extension -> writer function
+
+def register_reader(exts:  'iterable of str',
+                    magic: tuple = None):
+    """
+    Class decorator registering a Dataset backend reader.  Readers are constructed as reader(fname, **kwargs) and
+    must provide a 'columns' list and a read(name) method returning one column as a numpy.ndarray; a close() method,
+    if any, is called when the Dataset is closed.
+
+    :param exts:  file extensions handled, e.g. ('.mat',)
+    :param magic: (offset, bytes) identifying the format in a file's first 1024 bytes, if any
+    """
+
+    def register(cls):
+        _READERS.append((cls, tuple(exts), magic))
+        return cls
+
+    return register
+
+def register_writer(exts: 'iterable of str'):
+    """
+    Function decorator registering a Dataset backend writer, called as writer(fname, datadict, header).
+
+    :param exts: file extensions handled, e.g. ('.npz',)
+    """
+
+    def register(func):
+        for ext in exts:
+            _WRITERS[ext] = func
+        return func
+
+    return register
+
+class Dataset:
+    """
+    Column-oriented view of a data file of any registered format, indexed by column name or number.  Columns are
+    decoded on first access only, then kept.  Close it (or use it as a context manager) to release the file.
+
+    """
+
+    """
+    Member variables:
+    fname    = str
+    _reader  = backend reader object
+    _columns = dict of decoded columns
+    """
+
+    def __init__(self,
+                 fname:  str,
+                 fmt:    str = None,
+                 **kwargs):
+        """
+        Opens the file with the backend chosen by fmt, or else by sniffing the file's leading bytes, or else by its
+        extension; text tables are the fallback.  Only the column names are read here.
+
+        :param fname:  filename
+        :param fmt:    extension of the format to use, e.g. '.csv', overriding detection
+        :param kwargs: passed through to the reader (e.g. headerlen, delimiter for text tables)
+        """
+
+        self.fname    = fname
+        self._reader  = Dataset._sniff(fname, fmt)(fname, **kwargs)
+        self._columns = {}
+
+    @property
+    def columns(self):
+        """
+        Returns the list of column names.
+        """
+        return list(self._reader.columns)
+
+    def __getitem__(self, key: 'str or int'):
+        name = self._reader.columns[key] if isinstance(key, int) else key
+        if name not in self._columns:
+            if name not in self._reader.columns:
+                raise KeyError("The '{}' column requested is not present in {}".format(name, self.fname))
+            self._columns[name] = self._reader.read(name)
+
+        return self._columns[name]
+
+    def __contains__(self, name: str):
+        return name in self._reader.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self._reader.columns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Releases the backend's file handles; columns already decoded stay available.
+        """
+
+        close = getattr(self._reader, 'close', None)
+        if close is not None:
+            close()
+
+    def to_dict(self):
+        """
+        Decodes all columns.
+
+        :return: dict of column name -> numpy.ndarray
+        """
+        return {name: self[name] for name in self.columns}
+
+    def save(self,
+             fname:   str,
+             columns: 'iterable of str/int' = None,
+             fmt:     str = None):
+        """
+        Writes (some of) the columns to a file, in the format given by fmt or else the file's extension.
+
+        :param fname:   filename
+        :param columns: columns to write, by name or number; all if not specified
+        :param fmt:     extension of the format to use, e.g. '.npz'
+        """
+
+        names = self.columns if columns is None else [self._reader.columns[c] if isinstance(c, int) else c
+                                                      for c in columns]
+        save(fname, {name: self[name] for name in names}, names, fmt)
+
+    @staticmethod
+    def _sniff(fname: str,
+               fmt:   str):
+        """
+        Picks the reader class for a file.
+        """
+
+        if fmt is None:
+            with open(fname, 'rb') as f:
+                head = f.read(1024)
+            for cls, exts, magic in _READERS:
+                if magic is not None and head[magic[0]:magic[0] + len(magic[1])] == magic[1]:
+                    return cls
+            fmt = splitext(fname)[1]
+
+        for cls, exts, magic in _READERS:
+            if fmt.lower() in exts:
+                return cls
+
+        return _TextReader
+
+def load(fname: str,
+         fmt:   str = None,
+         **kwargs):
+    """
+    Opens a data file of any registered format as a Dataset.  See Dataset.
+    """
+
+    return Dataset(fname, fmt, **kwargs)
+
+def save(fname:    str,
+         datadict: dict,
+         header:   'ordered iterable of strings' = None,
+         fmt:      str = None):
+    """
+    Writes a dict of columns in the format given by fmt, or else by the file's extension.
+
+    :param fname:    filename
+    :param datadict: dict containing individual columns of data
+    :param header:   iterable of header strings; used to specify write order
+    :param fmt:      extension of the format to use, e.g. '.npz'
+    """
+
+    ext = (fmt or splitext(fname)[1]).lower()
+    if ext not in _WRITERS:
+        raise ValueError("No writer registered for '{}' files; choose from {}".format(ext, sorted(_WRITERS)))
+
+    _WRITERS[ext](fname, datadict, list(datadict.keys()) if header is None else list(header))
+
+@register_reader(('.dat', '.txt', '.out'))
+class _TextReader:
+    """
+    Whitespace-delimited (by default) text tables; the whole table is parsed once, on the first column read, through
+    the binary cache (see _load_table).  Columns of headerless tables (headerlen=0) are named by column number.
+    """
+
+    def __init__(self, fname, headerlen=1, commentchar='#', delimiter=None, cache=True):
+        self._fname  = fname
+        self._cache  = cache
+        self._kwargs = {'headerlen': headerlen, 'commentchar': commentchar, 'delimiter': delimiter}
+        self._cols   = None
+
+        with open(fname) as f:
+            line = ''
+            for ii, line in zip(range(headerlen), f):
+                pass
+            if headerlen >= 1:
+                self.columns = [h.strip() for h in line.lstrip(commentchar).split(sep=delimiter)]
+            else:
+                # count the fields of the first data line
+                for line in f:
+                    if line.strip() and not (commentchar and line.startswith(commentchar)):
+                        break
+                self.columns = list(range(len(line.split(sep=delimiter))))
+
+    def read(self, name):
+        if self._cols is None:
+            self._cols, _ = _load_table(self._fname, self._cache, **self._kwargs)
+        return self._cols[name]
+
+    def close(self):
+        self._cols = None
+
+@register_reader(('.csv',))
+class _CSVReader(_TextReader):
+    """
+    Comma-separated text tables.
+    """
+
+    def __init__(self, fname, headerlen=1, commentchar='#', delimiter=',', cache=True):
+        super().__init__(fname, headerlen, commentchar, delimiter, cache)
+
+@register_reader(('.npz',), magic=(0, b'PK\x03\x04'))
+class _NPZReader:
+    """
+    numpy .npz archives; members are decompressed individually on access.
+    """
+
+    def __init__(self, fname):
+        self._npz    = np.load(fname)
+        self.columns = list(self._npz.files)
+
+    def read(self, name):
+        return self._npz[name]
+
+    def close(self):
+        self._npz.close()
+
+@register_reader(('.mat',), magic=(0, b'MATLAB 5.0 MAT-file'))
+class _MATReader:
+    """
+    MAT v5 files; the variable directory is read without decoding data, then variables are memory-mapped (or loaded)
+    one at a time.
+    """
+
+    def __init__(self, fname):
+        import scipy.io
+
+        self._fname  = fname
+        self.columns = [name for name, shape, cls in scipy.io.whosmat(fname)]
+
+    def read(self, name):
+        return loadmat(self._fname, mmap=True, variable_names=[name])
+
+@register_reader(('.h5', '.hdf5'), magic=(512, b'\x89HDF\r\n\x1a\n'))
+class _MAT73Reader:
+    """
+    MAT v7.3 (HDF5-based) files; datasets are read one at a time.  Requires h5py.
+    """
+
+    def __init__(self, fname):
+        import h5py  # optional dependency
+
+        self._h5     = h5py.File(fname, 'r')
+        self.columns = [k for k in self._h5.keys() if not k.startswith('#')]
+
+    def read(self, name):
+        return np.squeeze(self._h5[name][()].T)
+
+    def close(self):
+        self._h5.close()
+
+@register_reader(('.parquet', '.pq'), magic=(0, b'PAR1'))
+class _ParquetReader:
+    """
+    Parquet files; only the requested column chunks are read and decoded.  Requires pyarrow.
+    """
+
+    def __init__(self, fname):
+        import pyarrow.parquet  # optional dependency
+
+        self._pq     = pyarrow.parquet.ParquetFile(fname)
+        self.columns = list(self._pq.schema_arrow.names)
+
+    def read(self, name):
+        return self._pq.read(columns=[name]).column(0).to_numpy()
+
+    def close(self):
+        self._pq.close()
+
+@register_writer(('.dat', '.txt', '.out'))
+def _write_text(fname, datadict, header):
+    savetxt(fname, datadict, header)
+
+@register_writer(('.csv',))
+def _write_csv(fname, datadict, header):
+    np.savetxt(fname, np.array([datadict[h] for h in header]).T, delimiter=',', header=','.join(header), comments='')
+
+@register_writer(('.npz',))
+def _write_npz(fname, datadict, header):
+    np.savez(fname, **{h: datadict[h] for h in header})
+
+@register_writer(('.mat',))
+def _write_mat(fname, datadict, header):
+    import scipy.io
+
+    scipy.io.savemat(fname, {h: datadict[h] for h in header})
+
+@register_writer(('.parquet', '.pq'))
+def _write_parquet(fname, datadict, header):
+    import pyarrow
+    import pyarrow.parquet
+
+    pyarrow.parquet.write_table(pyarrow.table({h: np.asarray(datadict[h]) for h in header}), fname)
@@ -1,139 +1,231 @@
-import matplotlib.patches
-import matplotlib.axis
-import matplotlib.axes
-
-def cozero_twins(ax1, ax2):
-    # Align on zero.  Make tick/gridlines colinear
-    ZOOM_THRESHOLD = .25 # move ratio at which function decides to re-zoom the slave axis to fit both datasets
-
-    def prepend_tick(ticks: list,
-                     s:     float):
+import numpy as np
+
+def cozero_twins(ax1: 'matplotlib.axes.Axes',
+                 ax2: 'matplotlib.axes.Axes',
+                 v:   'float, or (v1, v2)' = 0.0):
+    """
+    Aligns twin axes on the value v, and makes their tick/gridlines colinear.
+
+    Each axis keeps its current tick spacing; both get ticks at v + k*spacing for the same range of k, the smallest
+    covering both axes' data, and limits at the end ticks.  Computed directly in one pass.
+
+    :param ax1: axes 1
+    :param ax2: axes 2 (e.g. ax1.twinx())
+    :param v:   value to align, in the data units of both axes; or the values of axes 1 and 2 to align with each other
+
+    :return: lists of tick locations on axes 1, axes 2; None if an axis doesn't have two ticks to take a spacing from
+    """
+
+    from matplotlib.ticker import FixedLocator
+
+    EPS = 1e-9 # fraction of a tick spacing treated as round-off
+
+    vs = tuple(v) if np.ndim(v) else (v, v)
+
+    spacings, ranges = [], []
+    for ax in (ax1, ax2):
+        t = ax.get_yaxis().get_ticklocs()
+        if len(t) < 2:
+            return None
+        lo, hi = ax.get_yaxis().get_data_interval()
+        if not (np.isfinite(lo) and np.isfinite(hi)):
+            lo, hi = sorted(ax.get_ylim())
+        spacings.append(abs(t[1] - t[0]))
+        ranges.append((lo, hi))
+
+    # ticks needed below and above v for each axis' data; both axes get the most of either
+    below = max(max(int(np.ceil((v - lo)/sp - EPS)), 0) for v, sp, (lo, hi) in zip(vs, spacings, ranges))
+    above = max(max(int(np.ceil((hi - v)/sp - EPS)), 0) for v, sp, (lo, hi) in zip(vs, spacings, ranges))
+    if below + above == 0:
+        above = 1
+
+    k     = np.arange(-below, above + 1)
+    ticks = []
+    for ax, v, sp in zip((ax1, ax2), vs, spacings):
+        t = v + k*sp
+        ax.get_yaxis().set_major_locator(FixedLocator(t))  # unlike set_ticks, doesn't build Tick artists until drawn
+        ax.set_ylim(t[0], t[-1])
+        ticks.append(t.tolist())
+
+    return ticks[0], ticks[1]
+
+def cozero_figure(fig: 'matplotlib.figure.Figure',
+                  v:   'float, or (v1, v2)' = 0.0):
+    """
+    Aligns every pair of twin axes in a figure on the value v (see cozero_twins), e.g. for batch report generation.
+    Twins are axes sharing an x axis and occupying the same position.
+
+    :param fig: figure
+    :param v:   value to align
+
+    :return: list of the (axes, twin) pairs aligned
+    """
+
+    pairs = []
+    axes  = list(fig.axes)
+    pos   = [a.get_position().bounds for a in axes]
+    for ii, a in enumerate(axes):
+        shared = a.get_shared_x_axes()
+        for jj in range(ii + 1, len(axes)):
+            if pos[ii] == pos[jj] and shared.joined(a, axes[jj]):
+                pairs.append((a, axes[jj]))
+
+    for a, b in pairs:
+        cozero_twins(a, b, v)
+
+    return pairs
+
+def lodplot(ax:  'matplotlib.axes.Axes',
+            x:   'numpy.ndarray, (N,)',
+            y:   'numpy.ndarray, (N,)' = None,
+            *args,
+            **kwargs):
+    """
+    Plots a long time history decimated to the axis pixel width (see LODLine); a drop-in for ax.plot(x, y, ...) for a
+    single series.
+
+    :param ax:     axes to plot on
+    :param x:      monotonically increasing abscissae (or the ordinates, if y is not given)
+    :param y:      ordinates (or the format string, if x is the ordinates)
+    :param args:   format string, as for ax.plot
+    :param kwargs: line properties, as for ax.plot
+
+    :return: LODLine
+    """
+
+    if isinstance(y, str):  # lodplot(ax, y, fmt), as for ax.plot
+        args = (y,) + args
+        y    = None
+    if y is None:
+        x, y = np.arange(len(x)), x
+
+    return LODLine(ax, x, y, *args, **kwargs)
+
+class LODLine:
+    """
+    A line that only draws the min and max of the samples falling in each pixel column, so multi-million-point series
+    render quickly and with the same appearance as the full series.
+
+    A min/max pyramid is built once (levels of FACTOR, FACTOR**2, ... samples per bucket); whenever the x limits
+    change (zoom, pan, shared/twin axes) or the figure is resized, the coarsest level still giving OVERSAMPLE buckets
+    per pixel over the visible range is drawn, or the raw samples once few enough are visible.  The axes' data limits
+    get the full series' extents, so autoscaling and cozero_twins see the whole series.
+
+    """
+
+    FACTOR     = 4 # samples per bucket grow by this factor per pyramid level
+    OVERSAMPLE = 2 # buckets drawn per pixel column
+
+    """
+    Member variables:
+    ax      = matplotlib.axes.Axes
+    line    = matplotlib.lines.Line2D, drawn
+    x       = numpy.ndarray, (N,), abscissae, increasing
+    y       = numpy.ndarray, (N,), ordinates
+    _levels = list of (lo, hi) numpy.ndarray index pairs, of the min and max sample in each bucket, per level
+    _cids   = (axes callback id, canvas callback id)
+    """
+
+    def __init__(self,
+                 ax:  'matplotlib.axes.Axes',
+                 x:   'numpy.ndarray, (N,)',
+                 y:   'numpy.ndarray, (N,)',
+                 *args,
+                 **kwargs):
+        """
+        :param ax:     axes to plot on
+        :param x:      monotonically increasing abscissae
+        :param y:      ordinates
+        :param args:   format string, as for ax.plot
+        :param kwargs: line properties, as for ax.plot
         """
-        Adds a tick to the beginning of the tick list, spaced from the last tick by spacing s
 
-        :param ticks: list of tick locations
-        :param s:     spacing between ticks
+        self.ax = ax
+        self.x  = np.asarray(x)
+        self.y  = np.asarray(y)
+        if self.x.shape != self.y.shape or self.x.ndim != 1:
+            raise ValueError('x and y must be 1-D arrays of the same length')
 
-        :return: None
-        """
-        ticks.insert(0, ticks[0] - s)
+        self._levels = self._pyramid(self.y, self.FACTOR)
 
-    def append_tick(ticks: list,
-                    s:     float):
-        """
-        Adds a tick to the end of the tick list, spaced from the last tick by spacing s
+        xs, ys    = self._reduce(0, len(self.x), self._pixels())
+        self.line = ax.plot(xs, ys, *args, **kwargs)[0]
+
+        if len(self.x):
+            ax.update_datalim([(self.x[0], np.nanmin(self.y)), (self.x[-1], np.nanmax(self.y))])
+            ax.autoscale_view()
 
-        :param ticks: list of tick locations
-        :param s:     spacing between ticks
+        self._cids = (ax.callbacks.connect('xlim_changed', self.update),
+                      ax.figure.canvas.mpl_connect('resize_event', self.update))
 
-        :return: None
+    def update(self, *args):
         """
+        Redraws the series at the level of detail of the current x limits and axes width.
+        """
+
+        lo, hi = sorted(self.ax.get_xlim())
+        i0     = max(np.searchsorted(self.x, lo, 'left') - 1, 0)        # one sample beyond each side, so the line
+        i1     = min(np.searchsorted(self.x, hi, 'right') + 1, len(self.x)) # runs to the edges of the axes
 
-        ticks.append(ticks[-1] + s)
+        self.line.set_data(*self._reduce(i0, i1, self._pixels()))
 
-    def equalize_ticks(ax1: matplotlib.axes.Axes,
-                       ax2: matplotlib.axes.Axes,
-                       v:   float):
+    def remove(self):
+        """
+        Removes the line and its callbacks.
         """
-        Adds a tick to the axis that needs it, to either the lower or upper limit of the axis, as needed.
 
-        :param ax1: axis 1
-        :param ax2: axis 2
-        :param v:   value to align from both axes
+        self.ax.callbacks.disconnect(self._cids[0])
+        self.ax.figure.canvas.mpl_disconnect(self._cids[1])
+        self.line.remove()
 
-        :return: lists of tick locations on axis 1, axis 2
-        """
+    def _pixels(self):
+        return max(int(self.ax.get_window_extent().width), 1)
 
-        t1 = ax1.get_yaxis().get_ticklocs().tolist()
-        t2 = ax2.get_yaxis().get_ticklocs().tolist()
-
-        try:
-            t1.index(v)
-            t2.index(v)
-        except ValueError:
-            raise ValueError("Value {} not found in one or both axes".format(v))
-
-        # add tick(s) to the axis requiring them:
-        while len(t1) - len(t2) < 0:
-            # figure out where to add them:
-            if tick_relpos(t1, v) > tick_relpos(t2, v):
-                append_tick(t1, abs(t1[1] - t1[0]))
-            else:
-                prepend_tick(t1, abs(t1[1] - t1[0]))
-        while len(t2) - len(t1) < 0:
-            if tick_relpos(t2, v) > tick_relpos(t1, v):
-                append_tick(t2, abs(t2[1] - t2[0]))
-            else:
-                prepend_tick(t2, abs(t2[1] - t2[0]))
-
-        ax1.get_yaxis().set_ticks(t1)
-        ax2.get_yaxis().set_ticks(t2)
-
-        return t1, t2
-
-    def tick_relpos(ticks: list,
-                    v:     float):
+    def _reduce(self,
+                i0:     int,
+                i1:     int,
+                pixels: int):
+        """
+        returns: x, y to draw for samples i0:i1, at least OVERSAMPLE*pixels buckets (or all samples) wide
         """
-        Calculates the relative position of the value within the list.
 
-        :param ticks: list of tick locations
-        :param v:     value to search for
+        nbuckets = self.OVERSAMPLE * pixels
+        level    = -1
+        while level + 1 < len(self._levels) and (i1 - i0) // self.FACTOR**(level + 2) >= nbuckets:
+            level += 1
 
-        :return: float locating the tick specified by v on the interval [0, 1] where 1 is the last tick (100% of
-                 axis range) and 0 is the first tick (0% of the axis range)
-        """
-        return ticks.index(v)/(len(ticks) - 1)
+        if level < 0:
+            return self.x[i0:i1], self.y[i0:i1]
 
-    def detect_extra_ticks(a: matplotlib.axis.Axis):
-        """
-        Detects the extraneous ticks on an axis, based on the data plotted.
+        size   = self.FACTOR**(level + 1)
+        lo, hi = self._levels[level]
+        b0, b1 = i0 // size, -(-i1 // size)
+        idx    = np.sort(np.stack((lo[b0:b1], hi[b0:b1]), axis=-1), axis=-1).ravel()  # min and max in sample order
 
-        :param a: axis to check for extraneous ticks
+        return self.x[idx], self.y[idx]
 
-        :return:  tuple of tick indices which could be removed without clipping data
+    @staticmethod
+    def _pyramid(y:      'numpy.ndarray, (N,)',
+                 factor: int):
+        """
+        returns: list of (lo, hi) index arrays of the min and max sample of each bucket of factor**(k+1) samples, for
+                 the levels k with more than one bucket
         """
-        t = a.get_ticklocs()
-        return tuple([i for i in range(len(t) - 1) if t[i+1] < a.get_data_interval()[0]]
-                   + [i for i in range(1, len(t)) if t[i-1] > a.get_data_interval()[-1]])
-
-    try:
-        ticks1, ticks2 = equalize_ticks(ax1, ax2, 0.0)
-    except ValueError:
-        return # do nothing if the values to align don't exist in both axes
-
-    # get tick spacing (assumes evenly spaced)
-    sp1 = abs(ticks1[1] - ticks1[0])
-    sp2 = abs(ticks2[1] - ticks2[0])
-    if ticks1.index(0.0) != ticks2.index(0.0):
-        # shift ticks to align (if possible without zooming):
-        if abs(ticks1.index(0.0) - ticks2.index(0.0))/len(ticks1) <= ZOOM_THRESHOLD:
-            while ticks1.index(0.0) < ticks2.index(0.0):
-                # prepend to 1, append to 2:
-                prepend_tick(ticks1, sp1)
-                append_tick(ticks2, sp2)
-            while ticks2.index(0.0) < ticks1.index(0.0):
-                # prepend to 2, append to 1:
-                prepend_tick(ticks2, sp2)
-                append_tick(ticks1, sp1)
-            # re-tick axes
-            ax1.get_yaxis().set_ticks(ticks1)
-            ax2.get_yaxis().set_ticks(ticks2)
-            cozero_twins(ax1, ax2) # redo with zeros aligned
-        # can't shift; rezoom:
-        elif ticks2.index(0.0) > ticks1.index(0.0): # need to raise high limit of 2
-            lo, hi = ax2.get_ylim()
-            ax2.set_ylims(lo, lo + (len(ticks2) + 1) * sp2) # zooms to the equivalent of an additional tick
-            cozero_twins(ax1, ax2) # redo process with slight zoom out
-        # can't shift; rezoom:
-        elif ticks2.index(0.0) < ticks1.index(0.0): # need to lower the low limit of 2
-            lo, hi = ax2.get_ylim()
-            ax2.set_ylims(hi - (len(ticks2) + 1) * sp2, hi)
-            cozero_twins(ax1, ax2) # redo process with slight zoom out
-
-    # trim unnecessary ticks
-    to_remove = set(detect_extra_ticks(ax1.get_yaxis())) & set(detect_extra_ticks(ax2.get_yaxis()))
-    newticks  = [i for i in range(len(ticks1)) if not i in to_remove]
-    t1 = [ticks1[i] for i in newticks]
-    t2 = [ticks2[i] for i in newticks]
-    ax1.set_ylim((t1[0], t1[-1]))
-    ax2.set_ylim((t2[0], t2[-1]))
+
+        def merge(idx, pick):
+            # combines groups of factor buckets (the last may be partial), keeping the sample chosen by pick
+            n     = len(idx) // factor * factor
+            full  = idx[:n].reshape(-1, factor)
+            out   = full[np.arange(len(full)), pick(y[full], axis=1)]
+            if n < len(idx):
+                rest = idx[n:]
+                out  = np.append(out, rest[pick(y[rest])])
+            return out
+
+        levels = []
+        lo = hi = np.arange(len(y))
+        while len(lo) > factor:
+            lo, hi = merge(lo, np.argmin), merge(hi, np.argmax)
+            levels.append((lo, hi))
+
+        return levels
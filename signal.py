@@ -1,37 +1,529 @@
 import numpy as np
+from functools import lru_cache
 
-def psd(data:  'a 1xn (or nx1) numpy.ndarray', # the data to be asd'ed
-        fsamp: int):                           # sample frequency
+def psd(data:  'numpy.ndarray, 1-D or (channels, samples)/(samples, channels)', # the data to be psd'ed
+        fsamp: float,                                                          # sample frequency
+        nfft:  'str, int or None' = 'pow2',                                    # FFT length policy
+        axis:  int = None):                                                    # samples axis
     """
-    returns: the power spectral density of the given array, in dB.
+    returns: the power spectral density of the given array, in dB, with frequency along the samples axis.
              an array of corresponding frequencies
 
     NOTE: this algorithm mirrors the "periodogram" function in Matlab, but
-          with the addition of zero-padding to the nearest power of 2 for fft
-          function stability.
+          with the addition of zero-padding for fft speed: to the next power of 2
+          (nfft='pow2'), to the next 5-smooth length (nfft='fast', usually much
+          shorter), to a given length (nfft=int), or none (nfft=None).
 
           source: http://www.mathworks.com/help/signal/ug/psd-estimate-using-fft.html
+
+          2-D data holds one channel per row or column; all channels are transformed
+          in one batched FFT.  If axis isn't given, the longer dimension is taken as
+          samples (so 1xn and nx1 arrays are single channels).
     """
 
-    nsamples  = len(data)
+    data = np.asarray(data)
+    if axis is None:
+        axis = int(np.argmax(data.shape))
 
-    # find next power of 2 to zero pad for FFT function stability
-    targetlen = 1
-    while targetlen < nsamples:
-        targetlen *= 2
+    nsamples  = data.shape[axis]
+    targetlen = _fftlen(nsamples, nfft)
 
-    if targetlen == nsamples:
-        padded = data
-    else:
-        padded = np.resize(data, targetlen)
+    spec   = np.fft.rfft(data, n=targetlen, axis=axis)   # zero-pads to targetlen
+    psdx   = (spec.real**2 + spec.imag**2)/nsamples/fsamp
+
+    # one-sided: double all but DC (and Nyquist, for even lengths)
+    onesided = [slice(None)] * psdx.ndim
+    onesided[axis] = slice(1, (targetlen + 1) // 2)
+    psdx[tuple(onesided)] *= 2
 
-    psdx   = np.power(np.abs(np.fft.rfft(padded)), 2)/nsamples/fsamp
-    psdx[1:-1] = psdx[1:-1]*2
     psd_db = 10.*np.log10(psdx)
     freqs  = np.fft.rfftfreq(targetlen, d=1./fsamp)
 
     return freqs, psd_db
 
+def _fftlen(n:    int,
+            nfft: 'str, int or None'):
+    """
+    Returns the FFT length for n samples under the given policy (see psd).
+    """
+
+    if nfft is None:
+        return n
+    elif nfft == 'pow2':
+        return 1 << (n - 1).bit_length()
+    elif nfft == 'fast':
+        return _next_smooth(n)
+    elif isinstance(nfft, (int, np.integer)) and not isinstance(nfft, bool):
+        if nfft < n:
+            raise ValueError('nfft ({}) must be at least the number of samples ({})'.format(nfft, n))
+        return int(nfft)
+    else:
+        raise ValueError("nfft must be 'pow2', 'fast', an int or None, not {!r}".format(nfft))
+
+def _next_smooth(n: int):
+    """
+    Returns the smallest 5-smooth number (2^a*3^b*5^c) >= n; FFTs of these lengths are fast.
+    """
+
+    if n <= 1:
+        return 1
+
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # smallest p35*2^k >= n
+            cand = p35 << (-(-n // p35) - 1).bit_length()
+            best = min(best, cand)
+            p35 *= 3
+        p5 *= 5
+
+    return best
+
+def welch(data:     'a 1xn (or nx1) numpy.ndarray', # the data to be psd'ed
+          fsamp:    float,                         # sample frequency
+          nperseg:  int = 256,                     # samples per segment
+          window:   'str or numpy.ndarray' = 'hann',
+          noverlap: int = None):                   # samples shared by consecutive segments; nperseg//2 by default
+    """
+    returns: the averaged (Welch method) power spectral density of the given array, in dB.
+             an array of corresponding frequencies
+
+    NOTE: the data is cut into windowed, overlapping segments of nperseg samples, whose periodograms are averaged.
+          Compared to psd, the estimate has much lower variance, at a frequency resolution of fsamp/nperseg.  Trailing
+          samples that don't fill a segment are unused.  See WelchAccumulator to build the same estimate from chunks.
+    """
+
+    acc = WelchAccumulator(fsamp, nperseg, window, noverlap)
+    acc.update(np.ravel(data))
+
+    return acc.result()
+
+class WelchAccumulator:
+    """
+    Builds a Welch PSD estimate from a signal fed in consecutive chunks of any size (e.g. from io.loadtxt_iter), without
+    holding the whole record.  Gives the same result as welch on the concatenated chunks.
+
+    """
+
+    BATCH = 1024 # segments transformed per rfft call
+
+    """
+    Member variables:
+    fsamp    = float
+    nperseg  = int
+    step     = int, samples between segment starts
+    nseg     = int, segments accumulated
+    _win     = numpy.ndarray, window
+    _sum     = numpy.ndarray, running sum of |rfft|^2
+    _tail    = numpy.ndarray, samples not yet part of a complete segment (or shared with the next one)
+    """
+
+    def __init__(self,
+                 fsamp:    float,
+                 nperseg:  int = 256,
+                 window:   'str or numpy.ndarray' = 'hann',
+                 noverlap: int = None):
+        """
+        :param fsamp:    sample frequency
+        :param nperseg:  samples per segment
+        :param window:   window name ('hann', 'hamming', 'blackman', 'boxcar') or array of nperseg weights
+        :param noverlap: samples shared by consecutive segments; nperseg//2 by default
+        """
+
+        if noverlap is None:
+            noverlap = nperseg // 2
+        if not 0 <= noverlap < nperseg:
+            raise ValueError('noverlap must be on [0, nperseg)')
+
+        self.fsamp   = fsamp
+        self.nperseg = nperseg
+        self.step    = nperseg - noverlap
+        self.nseg    = 0
+        self._win    = _window(window, nperseg)
+        self._sum    = np.zeros(nperseg // 2 + 1)
+        self._tail   = np.empty(0)
+
+    def update(self, chunk: 'numpy.ndarray, (n,)'):
+        """
+        Adds the next chunk of the signal.
+        """
+
+        buf = np.concatenate((self._tail, np.ravel(chunk))) if len(self._tail) else np.ravel(chunk)
+
+        segs = _frames(buf, self.nperseg, self.step)
+        for start in range(0, len(segs), self.BATCH):
+            spec = np.fft.rfft(segs[start:start + self.BATCH] * self._win, axis=-1)
+            self._sum += np.sum(spec.real**2 + spec.imag**2, axis=0)
+
+        self.nseg += len(segs)
+        self._tail = buf[len(segs) * self.step:].copy()
+
+    def result(self):
+        """
+        returns: the averaged power spectral density so far, in dB.
+                 an array of corresponding frequencies
+        """
+
+        if self.nseg == 0:
+            raise ValueError('No complete segments of {} samples accumulated'.format(self.nperseg))
+
+        psdx = self._sum / (self.nseg * self.fsamp * np.sum(self._win**2))
+        psdx[1:(self.nperseg + 1) // 2] *= 2   # one-sided; DC (and Nyquist, for even nperseg) aren't doubled
+        freqs = np.fft.rfftfreq(self.nperseg, d=1./self.fsamp)
+
+        return freqs, 10.*np.log10(psdx)
+
+def spectrogram(data:     'numpy.ndarray, (n,), or iterable of chunks', # the data to be psd'ed
+                fsamp:    float,                                        # sample frequency
+                nperseg:  int = 256,                                    # samples per segment
+                window:   'str or numpy.ndarray' = 'hann',
+                noverlap: int = None,                                   # nperseg//2 by default
+                col:      'str or int' = None,                          # column to take from dict chunks
+                hold:     int = 1,                                      # segments summarized per output row
+                reduce:   str = 'max'):                                 # 'max' (max-hold) or 'mean'
+    """
+    returns: an array of times, at the centre of each segment (or group of hold segments)
+             an array of frequencies
+             the short-time power spectral density, in dB, as a (ntimes, nfreqs) array
+
+    NOTE: each row is the periodogram of one windowed segment, scaled as in welch.  For long records, use hold to
+          summarize hold consecutive segments per row (max-hold or mean) so the result is sized for plotting; see
+          stpsd_iter for the parameters and to consume the rows as they're computed.
+    """
+
+    blocks = list(stpsd_iter(data, fsamp, nperseg, window, noverlap, col, hold, reduce))
+    if not blocks:
+        raise ValueError('No complete segments of {} samples in the data'.format(nperseg))
+
+    times = np.concatenate([b[0] for b in blocks])
+    sxx   = np.concatenate([b[1] for b in blocks])
+    freqs = np.fft.rfftfreq(nperseg, d=1./fsamp)
+
+    return times, freqs, sxx
+
+def stpsd_iter(data:     'numpy.ndarray, (n,), or iterable of chunks',
+               fsamp:    float,
+               nperseg:  int = 256,
+               window:   'str or numpy.ndarray' = 'hann',
+               noverlap: int = None,
+               col:      'str or int' = None,
+               hold:     int = 1,
+               reduce:   str = 'max'):
+    """
+    Computes the short-time power spectral density block by block, so records larger than memory can be processed.
+
+    :param data:     signal as a 1-D array, or an iterable of consecutive chunks of it: arrays, or dicts of arrays
+                     such as those from io.loadtxt_iter
+    :param fsamp:    sample frequency
+    :param nperseg:  samples per segment
+    :param window:   window name ('hann', 'hamming', 'blackman', 'boxcar') or array of nperseg weights
+    :param noverlap: samples shared by consecutive segments; nperseg//2 by default
+    :param col:      key of the signal in dict chunks; may be omitted if the dicts hold one column
+    :param hold:     number of consecutive segments summarized per output row
+    :param reduce:   how segments are summarized: 'max' (max-hold) or 'mean'
+
+    :return: generator of (times, psd_db) blocks, psd_db being (ntimes, nfreqs); a final partial group of fewer than
+             hold segments is summarized on its own
+    """
+
+    REDUCERS = {'max':  np.max,
+                'mean': np.mean}
+    BATCH    = WelchAccumulator.BATCH
+
+    if noverlap is None:
+        noverlap = nperseg // 2
+    if not 0 <= noverlap < nperseg:
+        raise ValueError('noverlap must be on [0, nperseg)')
+    if hold < 1:
+        raise ValueError('hold must be at least 1')
+    if reduce not in REDUCERS:
+        raise ValueError("reduce must be one of {}, not '{}'".format(sorted(REDUCERS), reduce))
+
+    step   = nperseg - noverlap
+    win    = _window(window, nperseg)
+    red    = REDUCERS[reduce]
+    winbuf = np.empty((BATCH, nperseg))
+
+    # density scaling, one-sided; DC (and Nyquist, for even nperseg) aren't doubled
+    weight = np.full(nperseg // 2 + 1, 2. / (fsamp * np.sum(win**2)))
+    weight[0] /= 2
+    if nperseg % 2 == 0:
+        weight[-1] /= 2
+
+    def summarize(rows, i0, n):
+        # rows holds groups of n segments, the first being segment i0
+        ngrp  = len(rows) // n
+        pxx   = red(rows.reshape(ngrp, n, -1), axis=1) if n > 1 else rows
+        times = ((i0 + n*np.arange(ngrp) + (n - 1)/2.) * step + nperseg/2.) / fsamp
+        return times, 10.*np.log10(pxx)
+
+    chunks  = (data,) if isinstance(data, np.ndarray) else data
+    tail    = np.empty(0)
+    pending = None # segments awaiting a full group of hold
+    ndone   = 0    # segments summarized so far
+
+    for chunk in chunks:
+        if isinstance(chunk, dict):
+            if col is None:
+                if len(chunk) != 1:
+                    raise ValueError('col must be given for chunks holding {} columns'.format(len(chunk)))
+                chunk = next(iter(chunk.values()))
+            else:
+                chunk = chunk[col]
+
+        buf  = np.concatenate((tail, np.ravel(chunk))) if len(tail) else np.ravel(chunk)
+        segs = _frames(buf, nperseg, step)
+
+        for start in range(0, len(segs), BATCH):
+            batch = segs[start:start + BATCH]
+            spec  = np.fft.rfft(np.multiply(batch, win, out=winbuf[:len(batch)]), axis=-1)
+            pxx   = spec.real**2
+            pxx  += spec.imag**2
+            pxx  *= weight
+
+            if pending is not None:
+                pxx = np.concatenate((pending, pxx))
+            nfull   = len(pxx) // hold * hold
+            pending = pxx[nfull:] if nfull < len(pxx) else None
+
+            if nfull:
+                yield summarize(pxx[:nfull], ndone, hold)
+                ndone += nfull
+
+        tail = buf[len(segs) * step:].copy()
+
+    if pending is not None:
+        yield summarize(pending, ndone, len(pending))
+
+@lru_cache(maxsize=64)
+def design_sos(order:  int,
+               cutoff: 'float, or (low, high) tuple for band filters',
+               fsamp:  float,
+               btype:  str = 'lowpass'):
+    """
+    Designs a Butterworth filter as second-order sections.  Designs are cached by their arguments, so filters built
+    repeatedly (e.g. per file of a campaign) are designed once.
+
+    :param order:  filter order
+    :param cutoff: cutoff frequency, in the units of fsamp
+    :param fsamp:  sample frequency
+    :param btype:  'lowpass', 'highpass', 'bandpass' or 'bandstop'
+
+    :return: read-only (nsections, 6) numpy.ndarray of second-order sections
+    """
+
+    from scipy.signal import butter
+
+    sos = butter(order, cutoff, btype=btype, output='sos', fs=fsamp)
+    sos.setflags(write=False)
+
+    return sos
+
+def lowpass(data:   'numpy.ndarray',
+            fsamp:  float,
+            cutoff: float,
+            order:  int = 4,
+            axis:   int = -1):
+    """
+    Low-passes every channel of data along axis with one Butterworth design (causal; see Filter).
+
+    :param data:   array with samples along axis, e.g. (channels, samples)
+    :param fsamp:  sample frequency
+    :param cutoff: cutoff frequency
+    :param order:  filter order
+    :param axis:   samples axis
+
+    :return: filtered array, same shape as data
+    """
+
+    return Filter(fsamp, cutoff, order, 'lowpass', axis)(data)
+
+class Filter:
+    """
+    A Butterworth filter applied to many channels at once, block by block.  The filter state is carried from one block
+    to the next, so filtering a record in chunks (e.g. from io.loadtxt_iter) gives bit-identical results to filtering
+    it whole.
+
+    """
+
+    """
+    Member variables:
+    sos  = numpy.ndarray, (nsections, 6), second-order sections (see design_sos)
+    axis = int, samples axis
+    zi   = numpy.ndarray, filter state; None before the first block
+    """
+
+    def __init__(self,
+                 fsamp:  float,
+                 cutoff: 'float, or (low, high) tuple for band filters',
+                 order:  int = 4,
+                 btype:  str = 'lowpass',
+                 axis:   int = -1):
+        """
+        :param fsamp:  sample frequency
+        :param cutoff: cutoff frequency
+        :param order:  filter order
+        :param btype:  'lowpass', 'highpass', 'bandpass' or 'bandstop'
+        :param axis:   samples axis of the blocks
+        """
+
+        cutoff    = tuple(cutoff) if np.ndim(cutoff) else cutoff  # hashable, for the design cache
+        self.sos  = design_sos(order, cutoff, fsamp, btype).copy()  # sosfilt needs it writable
+        self.axis = axis
+        self.zi   = None
+
+    def __call__(self, block: 'numpy.ndarray'):
+        """
+        Filters the next block of samples; all blocks must have the same shape apart from their samples axis.
+        """
+
+        from scipy.signal import sosfilt
+
+        block = np.asarray(block, dtype=np.float64)
+        if self.zi is None:
+            shape = list(block.shape)
+            shape[self.axis] = 2
+            self.zi = np.zeros([len(self.sos)] + shape)
+
+        out, self.zi = sosfilt(self.sos, block, axis=self.axis, zi=self.zi)
+
+        return out
+
+    def reset(self):
+        """
+        Clears the filter state, to start a new record.
+        """
+
+        self.zi = None
+
+def decimate(data: 'numpy.ndarray',
+             q:    int,
+             taps: 'numpy.ndarray' = None,
+             axis: int = -1):
+    """
+    Anti-alias filters and downsamples every channel of data by q along axis (see Decimator).
+
+    :param data: array with samples along axis, e.g. (channels, samples)
+    :param q:    downsampling factor
+    :param taps: FIR anti-aliasing filter; a 20*q+1 tap Hamming-windowed design by default
+    :param axis: samples axis
+
+    :return: array of ceil(nsamples/q) samples along axis
+    """
+
+    return Decimator(q, taps, axis)(data)
+
+class Decimator:
+    """
+    Polyphase FIR decimation by an integer factor, block by block.  Only the kept output samples are computed (about
+    ntaps/q multiplies per input sample), and the filter history is carried between blocks, so chunked input gives
+    bit-identical results to decimating the whole record.
+
+    Output sample m is sum_k taps[k] * x[m*q - k] (samples before the first are zero), i.e. the FIR-filtered record
+    taken every q samples.  The default linear-phase design delays the output by (ntaps - 1)/2 input samples (10
+    output samples).
+
+    """
+
+    """
+    Member variables:
+    q     = int, downsampling factor
+    taps  = numpy.ndarray, FIR filter
+    axis  = int, samples axis
+    _hlen = int, input history needed ahead of each output, rounded up to a multiple of q
+    _hist = numpy.ndarray, input samples from _hlen before the next output onward; None before the first block
+    """
+
+    def __init__(self,
+                 q:    int,
+                 taps: 'numpy.ndarray' = None,
+                 axis: int = -1):
+        """
+        :param q:    downsampling factor
+        :param taps: FIR anti-aliasing filter; a 20*q+1 tap Hamming-windowed design (cutoff at the new Nyquist) by
+                     default
+        :param axis: samples axis of the blocks
+        """
+
+        if q < 1:
+            raise ValueError('q must be a positive integer')
+
+        if taps is None:
+            from scipy.signal import firwin
+            taps = firwin(20*q + 1, 1./q, window='hamming')
+
+        self.q     = int(q)
+        self.taps  = np.asarray(taps, dtype=np.float64)
+        self.axis  = axis
+        self._hlen = -(-(len(self.taps) - 1) // self.q) * self.q
+        self._hist = None
+
+    def __call__(self, block: 'numpy.ndarray'):
+        """
+        Decimates the next block of samples; all blocks must have the same shape apart from their samples axis.
+
+        returns: the output samples completed by this block
+        """
+
+        from scipy.signal import upfirdn
+
+        block = np.moveaxis(np.asarray(block, dtype=np.float64), self.axis, -1)
+        if self._hist is None:
+            self._hist = np.zeros(block.shape[:-1] + (self._hlen,))
+
+        # buf starts _hlen samples before the next output, so outputs fall on multiples of q
+        buf  = np.concatenate((self._hist, block), axis=-1)
+        nout = (buf.shape[-1] - 1 - self._hlen) // self.q + 1
+        out  = upfirdn(self.taps, buf, 1, self.q, axis=-1)[..., self._hlen // self.q:][..., :nout]
+
+        self._hist = buf[..., nout*self.q:].copy()
+
+        return np.moveaxis(out, -1, self.axis)
+
+    def reset(self):
+        """
+        Clears the filter history, to start a new record.
+        """
+
+        self._hist = None
+
+def _frames(data:    'numpy.ndarray, (n,)',
+            nperseg: int,
+            step:    int):
+    """
+    Returns the complete segments of data, nperseg samples each, starting every step samples, as a (nseg, nperseg)
+    strided view (no copy).
+    """
+
+    if len(data) < nperseg:
+        return np.empty((0, nperseg), dtype=data.dtype)
+
+    return np.lib.stride_tricks.sliding_window_view(data, nperseg)[::step]
+
+def _window(window: 'str or numpy.ndarray',
+            n:      int):
+    """
+    Returns the n-sample periodic window of the given name, or checks the length of the given window array.
+    """
+
+    WINDOWS = {'hann':     np.hanning,
+               'hamming':  np.hamming,
+               'blackman': np.blackman,
+               'boxcar':   np.ones}
+
+    if isinstance(window, str):
+        if window not in WINDOWS:
+            raise ValueError("Window must be one of {} or an array, not '{}'".format(sorted(WINDOWS), window))
+        return WINDOWS[window](n + 1)[:-1]
+
+    window = np.asarray(window, dtype=np.float64)
+    if window.shape != (n,):
+        raise ValueError('Window must have {} samples'.format(n))
+
+    return window
+
 def sinusoid(f_sig:     float,
              f_samp:    float,
              t_end:     float,
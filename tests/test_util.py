@@ -0,0 +1,14 @@
+import numpy as np
+
+from os.path import isfile, join
+
+from gnctools.util import convertTree
+
+def test_convertTree_single_path(tmp_path):
+    src = join(str(tmp_path), 'run.dat')
+    np.savetxt(src, np.arange(6.).reshape(3, 2), header='a b', comments='')
+
+    results = convertTree(str(tmp_path), jobs=1, verbose=False)
+
+    assert results == {src: 'converted'}
+    assert isfile(join(str(tmp_path), 'run.mat'))
@@ -1,15 +1,31 @@
+import json
 import numpy as np
+import os
+import struct
+import sys
+import threading
+import time
 
-from os import chdir, getcwd, remove
-from os.path import abspath
-from shutil import copy, move
-from subprocess import call
-from scipy.io import savemat
+from glob import glob
+from hashlib import sha256
+from os import chmod, link, makedirs, remove, rename, stat, utime
+from os.path import abspath, expanduser, getmtime, getsize, isdir, isfile, join, splitext
+from shutil import copy, copy2, move, rmtree, which
+from subprocess import PIPE, TimeoutExpired, call, run
+from tempfile import mkdtemp
+
+from .coord import RotationArray
+from .io import _evict_lru, _iter_blocks
+
+RESULT_CACHE_DIR      = os.environ.get('GNCTOOLS_RESULTS', join(expanduser('~'), '.cache', 'gnctools', 'results'))
+RESULT_CACHE_MAXBYTES = 50 * 2**30  # LRU-evicted down to this size
 
 def runExe(exe_name:  str,
            exe_dir:   str,
            pre_copy:  dict,
-           post_move: dict):
+           post_move: dict,
+           cache:     'ResultCache' = None,
+           params:    dict = None):
     """
     Function to handle running an executable.  Copies files into new locations, moves output files.
 
@@ -17,130 +33,1027 @@ def runExe(exe_name:  str,
     :param exe_dir:   path to the directory in which the executable resides
     :param pre_copy:  dict of files to copy prior to run (keys paths get copied to values paths)
     :param post_move: dict of files to move after run (keys paths get moved to values paths)
-    :return:
+    :param cache:     if given, the post_move outputs are restored from it instead of running, when the executable,
+                      the pre_copy files and params are unchanged since a previous run
+    :param params:    any other (JSON-serializable) settings of the case, for the cache key
+    :return:          True if the executable was run, False if its outputs were restored from the cache
     """
-    #Copies files in pre_copy, cds to exe_dir, runs exe_name, moves files in post_move.
+    #Copies files in pre_copy, runs exe_name in exe_dir, moves files in post_move.
 
     # convert paths to absolute
-    this_dir = abspath(getcwd())
     exe_dir  = abspath(exe_dir)
 
+    if cache is not None:
+        exe_path = join(exe_dir, exe_name) if isfile(join(exe_dir, exe_name)) else which(exe_name)
+        if exe_path is None:
+            raise FileNotFoundError("Executable '{}' not found in {} or on PATH".format(exe_name, exe_dir))
+        case_key = cache.key(exe_path, pre_copy, params)
+        if cache.restore(case_key, post_move):
+            print('Restored ' + exe_name + ' outputs from cache')
+            return False
+
     # copy input files
     for key, value in pre_copy.items():
         copy(key, value)
 
-    # change directories, run code, change back
-    chdir(exe_dir)
+    # run code in exe_dir; the process's own cwd is left alone, so runs can go concurrently (see runCampaign)
     print('Running ' + exe_name + '...')
-    call(exe_name)
-    chdir(this_dir)
+    call(exe_name, cwd=exe_dir)
     print('Finished! \n')
 
     # move output files
     for key, value in post_move.items():
         move(key, value)
 
+    if cache is not None:
+        cache.store(case_key, post_move)
+
+    return True
+
+class ResultCache:
+    """
+    Content-addressed store of the outputs of executable runs, so unchanged cases are never rerun (see runExe and
+    runCampaign).  A case's key is the sha256 of the executable, the contents of every input file (with the name it's
+    copied to) and the case parameters.
+
+    Each entry is a directory of root holding the output files and a manifest.json.  Entries are published with an
+    atomic rename, so concurrent processes and threads only ever see complete entries, and are least-recently-used
+    evicted down to maxbytes.  Outputs are copied in when stored, and restored by hardlink where possible (falling back
+    to copying), so cached files are made read-only: replace restored outputs rather than modifying them in place.
+
+    """
+
+    BLOCKSIZE = 2**20 # bytes hashed per read
+
+    """
+    Member variables:
+    root     = str, cache directory
+    maxbytes = int, size the entries are evicted down to
+    hits     = int, restores made
+    misses   = int, restores asked for but not found
+    _digests = dict, (path, size, mtime_ns) -> sha256 of files hashed, so unchanged executables are hashed once
+    _lock    = threading.Lock, guarding the counts and _digests
+    """
+
+    def __init__(self,
+                 root:     str = None,
+                 maxbytes: int = None):
+        """
+        :param root:     cache directory; RESULT_CACHE_DIR (GNCTOOLS_RESULTS, or ~/.cache/gnctools/results) by default
+        :param maxbytes: size the entries are evicted down to; RESULT_CACHE_MAXBYTES by default
+        """
+
+        self.root     = abspath(root or RESULT_CACHE_DIR)
+        self.maxbytes = RESULT_CACHE_MAXBYTES if maxbytes is None else maxbytes
+        self.hits     = 0
+        self.misses   = 0
+        self._digests = {}
+        self._lock    = threading.Lock()
+
+    def key(self,
+            exe:    str,
+            inputs: 'dict or iterable of str',
+            params: dict = None):
+        """
+        :param exe:    path to the executable
+        :param inputs: dict of input file path -> name or path it's copied to, or iterable of input file paths
+        :param params: any other (JSON-serializable) settings of the case
+
+        :return: hex digest identifying the case
+        """
+
+        inputs = inputs if isinstance(inputs, dict) else {p: '' for p in inputs}
+
+        h = sha256()
+        h.update(self._digest(exe).encode())
+        for src, dst in sorted(inputs.items(), key=lambda item: (str(item[1]), str(item[0]))):
+            h.update(json.dumps(str(dst)).encode())
+            h.update(self._digest(src).encode())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+
+        return h.hexdigest()
+
+    def restore(self,
+                key:     str,
+                outputs: dict):
+        """
+        Restores the outputs of a cached case.
+
+        :param key:     case key
+        :param outputs: dict of output name (as given to store) -> path to restore it to
+
+        :return: True on a hit; False on a miss
+        """
+
+        entry = join(self.root, key)
+        try:
+            with open(join(entry, 'manifest.json')) as f:
+                files = json.load(f)['files']
+            if not all(name in files for name in outputs):
+                raise KeyError('Cached entry lacks outputs')
+
+            for name, dst in outputs.items():
+                if isfile(dst):
+                    remove(dst)
+                try:
+                    link(join(entry, files[name]), dst)
+                except OSError:
+                    copy2(join(entry, files[name]), dst)  # e.g. across filesystems
+                    chmod(dst, 0o644)
+
+            utime(join(entry, 'manifest.json'))  # mark as recently used
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self,
+              key:     str,
+              outputs: dict):
+        """
+        Adds a case's outputs to the cache.
+
+        :param key:     case key
+        :param outputs: dict of output name -> path of the output file
+
+        :return: nothing
+        """
+
+        makedirs(self.root, exist_ok=True)
+        tmp   = mkdtemp(prefix='.tmp', dir=self.root)
+        files = {}
+        for ii, (name, path) in enumerate(outputs.items()):
+            files[name] = 'out{}'.format(ii)
+            copy2(path, join(tmp, files[name]))  # a copy, so the caller's file stays its own
+            chmod(join(tmp, files[name]), 0o444)
+        with open(join(tmp, 'manifest.json'), 'w') as f:
+            json.dump({'files': files}, f)
+
+        entry = join(self.root, key)
+        try:
+            rename(tmp, entry)
+        except OSError:
+            # already cached, e.g. by a concurrent run of the same case; kept unless it lacks some of these outputs
+            try:
+                with open(join(entry, 'manifest.json')) as f:
+                    stale = not all(name in json.load(f)['files'] for name in files)
+            except (OSError, ValueError, KeyError):
+                stale = True
+            if stale:
+                old = mkdtemp(prefix='.tmp', dir=self.root)
+                try:
+                    rename(entry, join(old, key))
+                    rename(tmp, entry)
+                except OSError:
+                    pass
+                rmtree(old, ignore_errors=True)
+            rmtree(tmp, ignore_errors=True)
+
+        _evict_lru(self.root, self.maxbytes)
+
+    @property
+    def stats(self):
+        """
+        returns: dict of the hit and miss counts, and the hit rate
+        """
+
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hitrate': self.hits / total if total else 0.}
+
+    def _digest(self, path: str):
+        st  = stat(path)
+        sig = (abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if sig in self._digests:
+                return self._digests[sig]
+
+        h = sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.BLOCKSIZE), b''):
+                h.update(block)
+
+        with self._lock:
+            self._digests[sig] = h.hexdigest()
+        return self._digests[sig]
+
+class CaseResult:
+    """
+    Outcome of one case of a campaign (see runCampaign).
+
+    """
+
+    """
+    Member variables:
+    name       = str, case name
+    returncode = int, exit status of the last attempt; None if it timed out or never ran
+    attempts   = int, number of runs made
+    wall       = float, wall time of the last attempt, s
+    stdout     = str, captured output of the last attempt
+    stderr     = str, captured error output of the last attempt
+    outputs    = dict, output name -> final path, of the outputs moved out
+    scratch    = str, scratch directory, if kept (on failure, or if asked for)
+    cached     = bool, whether the outputs were restored from a ResultCache instead of running
+    error      = Exception raised by the case, if any
+    """
+
+    def __init__(self, name: str):
+        self.name       = name
+        self.returncode = None
+        self.attempts   = 0
+        self.wall       = 0.
+        self.stdout     = ''
+        self.stderr     = ''
+        self.outputs    = {}
+        self.scratch    = None
+        self.cached     = False
+        self.error      = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.returncode == 0
+
+    def __repr__(self):
+        status = 'ok' if self.ok else repr(self.error) if self.error else 'exit {}'.format(self.returncode)
+        if self.cached:
+            return '<CaseResult {}: {}, cached>'.format(self.name, status)
+        return '<CaseResult {}: {}, {} attempt(s), {:.2f} s>'.format(self.name, status, self.attempts, self.wall)
+
+def runCampaign(exe:          str,
+                cases:        dict,
+                workdir:      str,
+                jobs:         int   = None,
+                timeout:      float = None,
+                retries:      int   = 0,
+                keep_scratch: bool  = False,
+                tomat:        dict  = None,
+                cache:        ResultCache = None,
+                verbose:      bool  = True):
+    """
+    Runs an executable over many cases concurrently, following runExe's copy-in / run / move-out model.  Each case
+    runs in its own scratch directory under workdir (passed as the subprocess's cwd), so cases don't share any state.
+
+    :param exe:          path to the executable, or its name on PATH
+    :param cases:        dict of case name -> dict of:
+                           'inputs':  dict of files to copy in (source path -> name in the scratch directory)
+                           'outputs': dict of files to move out (name in the scratch directory -> destination path)
+                           'args':    list of command line arguments (optional)
+                           'params':  any other (JSON-serializable) settings of the case, for the cache key (optional)
+    :param workdir:      directory in which to make the scratch directories
+    :param jobs:         number of cases to run at once; one per core if not specified
+    :param timeout:      seconds after which a run is killed (and counts as failed)
+    :param retries:      number of times to rerun a case that fails or times out, each in a fresh scratch directory
+    :param keep_scratch: keep scratch directories of successful cases (those of failed cases are always kept)
+    :param tomat:        if given, each output moved out is converted to a .mat file beside it (convertToMAT, with
+                         this dict as keyword arguments), and outputs maps to the .mat path
+    :param cache:        if given, cases whose executable, inputs, args and params are unchanged since a previous run
+                         have their (final) outputs restored from it instead of running
+    :param verbose:      print progress and throughput
+
+    :return: dict of case name -> CaseResult
+    """
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    # made absolute, as the cases run with their scratch directories as cwd; a bare name is looked up on PATH
+    exe_path = abspath(exe) if isfile(exe) else which(exe)
+    if exe_path is None:
+        raise FileNotFoundError("Executable '{}' not found as a file or on PATH".format(exe))
+    exe = exe_path
+    makedirs(workdir, exist_ok=True)
+
+    # threads suffice: each worker spends its time waiting on its subprocess
+    results = {}
+    t0      = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = {pool.submit(_run_case, exe, name, spec, workdir, timeout, retries, keep_scratch, tomat, cache): name
+                   for name, spec in cases.items()}
+        for count, fut in enumerate(as_completed(futures), 1):
+            res = results[futures[fut]] = fut.result()
+            if verbose:
+                print('[{}/{}] {}'.format(count, len(futures), res))
+
+    if verbose:
+        elapsed = time.perf_counter() - t0
+        nfailed = sum(not r.ok for r in results.values())
+        print('{} cases in {:.1f} s ({:.2f} cases/s), {} failed'.format(
+            len(results), elapsed, len(results) / max(elapsed, 1e-9), nfailed))
+        if cache is not None:
+            print('cache: {hits} hits, {misses} misses'.format(**cache.stats))
+
+    return results
+
+def _run_case(exe:          str,
+              name:         str,
+              spec:         dict,
+              workdir:      str,
+              timeout:      float,
+              retries:      int,
+              keep_scratch: bool,
+              tomat:        dict,
+              cache:        ResultCache):
+    """
+    Runs one case of runCampaign; errors are recorded in the result rather than raised.
+    """
+
+    res     = CaseResult(name)
+    scratch = None
+    try:
+        if cache is not None:
+            finals = {src: dst if tomat is None else splitext(dst)[0] + '.mat'
+                      for src, dst in spec.get('outputs', {}).items()}
+            key    = cache.key(exe, spec.get('inputs', {}),
+                               {'args': [str(a) for a in spec.get('args', ())], 'params': spec.get('params'),
+                                'tomat': tomat})
+            if cache.restore(key, finals):
+                res.returncode = 0
+                res.outputs    = finals
+                res.cached     = True
+                return res
+
+        for attempt in range(retries + 1):
+            if scratch is not None:
+                rmtree(scratch, ignore_errors=True)
+            scratch = mkdtemp(prefix=name + '_', dir=workdir)
+
+            for src, dst in spec.get('inputs', {}).items():
+                copy(src, join(scratch, dst))
+
+            res.attempts += 1
+            res.error     = None
+            t0            = time.perf_counter()
+            try:
+                proc = run([exe] + [str(a) for a in spec.get('args', ())], cwd=scratch, stdout=PIPE, stderr=PIPE,
+                           timeout=timeout)
+                res.returncode = proc.returncode
+                res.stdout     = proc.stdout.decode(errors='replace')
+                res.stderr     = proc.stderr.decode(errors='replace')
+            except TimeoutExpired as e:
+                res.returncode = None
+                res.stdout     = (e.stdout or b'').decode(errors='replace')
+                res.stderr     = (e.stderr or b'').decode(errors='replace')
+                res.error      = e
+            res.wall = time.perf_counter() - t0
+
+            if res.ok:
+                break
+
+        if res.ok:
+            for src, dst in spec.get('outputs', {}).items():
+                move(join(scratch, src), dst)
+                if tomat is not None:
+                    mat = splitext(dst)[0] + '.mat'
+                    convertToMAT(dst, mat, **tomat)
+                    dst = mat
+                res.outputs[src] = dst
+
+            if cache is not None:
+                cache.store(key, res.outputs)
+    except Exception as e:
+        res.error = e
+
+    if res.ok and not keep_scratch:
+        rmtree(scratch, ignore_errors=True)
+    else:
+        res.scratch = scratch
+
+    return res
+
 def share_domain(domains: 'iterable of iterables',
-                 ranges:  'iterable of np.array'):
+                 ranges:  'iterable of np.array',
+                 quats:   'iterable of bool' = None,
+                 inject:  'iterable of float' = None,
+                 mode:    str = 'linear'):
     """
     Interpolates arrays to a common domain, for the extent of the domain given (does not extend beyond the last
     element).  Trims datasets such that only the overlapping portion is returned.
 
-    :param domains:      iterable of 1-D arrays; must be monotonically increasing
-    :param ranges:       iterable of 1-D arrays
+    The combined domain is the merge of all domain points in the overlap (plus any injected).  One InterpPlan is built
+    per distinct domain and applied to all columns of each range at once, so sources sharing a time base share the
+    bracket search.
 
-    :return: combined domain, list of ranges
+    :param domains:      iterable of 1-D arrays; must be monotonically increasing
+    :param ranges:       iterable of 1-D arrays, or 2-D arrays with one row (or, failing that, one column) per domain
+                         point
+    :param quats:        iterable of flags, one per range, marking (N,4) scalar-first quaternion ranges; these are
+                         slerped (see coord.interp_quat) instead of interpolated column by column
+    :param inject:       additional points to include in the combined domain (those outside the overlap are dropped)
+    :param mode:         'linear', 'previous' or 'nearest'; see InterpPlan
 
-    NOTE:
-        - will have an issue with equal-dimensioned arrays (won't be able to distinguish range data entities)
+    :return: combined domain, list of ranges (2-D ranges as one row per domain point)
     """
-    # TODO: add ability to inject points in domain
     # input checks ----------------
     assert(len(domains) == len(ranges))
+    if quats is None:
+        quats = [False] * len(ranges)
     for d, r in zip(domains, ranges):
         assert(is_monotonic(d))
         assert(len(d) in r.shape)
         assert(len(r.shape) <= 2)
     # -----------------------------
 
-    # get floor/ceil of overlapping section, find corresponding indices for each dataset
-    x_floor = np.max([np.min(d) for d in domains])
-    x_ceil  = np.min([np.max(d) for d in domains])
-
-    # get combined domain points
-    x_comb  = np.unique(np.concatenate(domains))
-    inds    = np.where(x_floor <= x_comb)
-    inds    = np.where(x_ceil  >= x_comb[inds])
-
-    # put in column-array format for slicing up into individual columns:
-    newranges = [np.transpose(r) if len(r.shape) > 1 and len(d) == r.shape[1] else r for d, r in zip(domains, ranges)]
-
-    # split out into single columns
-    x_list = []
-    y_list = []
-    dims   = []
-    for x, r in zip([np.squeeze(d) for d in domains], newranges):
-        if len(r.shape) > 1:
-            dims.append(r.shape[1])
-            for col in range(r.shape[1]):
-                x_list.append(x)
-                y_list.append(r[:, col])
-        else:
-            dims.append(1)
-            x_list.append(x)
-            y_list.append(r)
+    domains = [np.ravel(d) for d in domains]
+
+    # get floor/ceil of overlapping section
+    x_floor = np.max([d[0]  for d in domains])
+    x_ceil  = np.min([d[-1] for d in domains])
 
-    # interpolate to combined domain
-    interpranges = [np.interp(x_comb[inds], x, y) for x, y, in zip(x_list, y_list)]
+    # merge the overlapping part of every domain (each already sorted, so the stable sort only merges runs)
+    parts = [d[np.searchsorted(d, x_floor):np.searchsorted(d, x_ceil, side='right')] for d in domains]
+    if inject is not None:
+        inj = np.ravel(np.asarray(inject, dtype=np.float64))
+        parts.append(inj[(inj >= x_floor) & (inj <= x_ceil)])
+    x_comb = np.sort(np.concatenate(parts), kind='stable')
+    x_comb = x_comb[np.concatenate(([True], np.diff(x_comb) != 0))] if len(x_comb) else x_comb
 
-    # need to loop through the interpranges and squish back together based on contents of dims
+    # one plan per distinct domain
+    plans = []
     finalranges = []
-    for dim in dims:
-        if dim > 1:
-            matrix = []
-            for i in range(dim):
-                matrix.append(interpranges.pop(0))
-            finalranges.append(np.transpose(np.array(matrix))) # will naturally row stack if not specified
+    for d, r, isquat in zip(domains, ranges, quats):
+        plan = next((p for dp, p in plans if dp is d or (len(dp) == len(d) and np.array_equal(dp, d))), None)
+        if plan is None:
+            plan = InterpPlan(d, x_comb, mode)
+            plans.append((d, plan))
+
+        # rows are domain points
+        r = np.asarray(r)
+        if r.ndim > 1 and r.shape[0] != len(d):
+            r = r.T
+
+        finalranges.append(plan.quat(r) if isquat else plan(r))
+
+    return x_comb, finalranges
+
+class InterpPlan:
+    """
+    Precomputed interpolation from one (monotonically increasing) domain to another: the bracketing source index and
+    blend weight of every target point.  Build once, then apply to any number of ranges on the same source domain.
+
+    Modes:
+        'linear'   - linear interpolation (as numpy.interp)
+        'previous' - value at the last source point at or before the target point (zero-order hold)
+        'nearest'  - value at the nearest source point (ties go to the later point)
+
+    Target points outside of the source domain take the end values.
+
+    """
+
+    MODES = ('linear', 'previous', 'nearest')
+
+    """
+    Member variables:
+    mode = str
+    lo   = numpy.ndarray of int, lower bracketing source index per target point
+    w    = numpy.ndarray of float, weight of the upper bracketing point (0 or 1 for the non-linear modes)
+    """
+
+    def __init__(self,
+                 xp:   'numpy.ndarray, (N,)',
+                 x:    'numpy.ndarray, (M,)',
+                 mode: str = 'linear'):
+        """
+        :param xp:   source domain
+        :param x:    target domain
+        :param mode: one of MODES
+        """
+
+        if mode not in InterpPlan.MODES:
+            raise ValueError("Interpolation mode must be one of {}, not '{}'".format(InterpPlan.MODES, mode))
+
+        xp = np.asarray(xp, dtype=np.float64)
+        x  = np.asarray(x,  dtype=np.float64)
+
+        if len(xp) < 2:
+            lo = np.zeros(len(x), dtype=np.intp)
+            w  = np.zeros(len(x))
         else:
-            finalranges.append(np.array(interpranges.pop(0)))
+            lo = np.clip(np.searchsorted(xp, x, side='right') - 1, 0, len(xp) - 2)
+            dx = xp[lo + 1] - xp[lo]
+            w  = np.clip(np.divide(x - xp[lo], dx, out=np.zeros(len(x)), where=dx != 0), 0., 1.)
+
+        if mode == 'previous':
+            w = (w >= 1.).astype(np.float64)
+        elif mode == 'nearest':
+            w = (w >= .5).astype(np.float64)
+
+        self.mode = mode
+        self.lo   = lo
+        self.w    = w
+
+    def __call__(self,
+                 y: 'numpy.ndarray, (N,) or (N,k)'):
+        """
+        Applies the plan to all columns of y.
+
+        :return: numpy.ndarray, (M,) or (M,k)
+        """
+
+        y = np.asarray(y)
+        if self.mode != 'linear':
+            return y[self.lo + (self.w > 0.)]
+
+        w  = self.w if y.ndim == 1 else self.w[:, np.newaxis]
+        y0 = y[self.lo]
+
+        return y0 + (y[np.minimum(self.lo + 1, len(y) - 1)] - y0) * w
+
+    def quat(self,
+             q: 'numpy.ndarray, (N,4)'):
+        """
+        Applies the plan to scalar-first quaternions, by slerp along the shortest path (see coord.interp_quat).
+
+        :return: numpy.ndarray, (M,4)
+        """
 
-    return x_comb[inds], finalranges
+        q = RotationArray._continuous(RotationArray._normalize(np.array(q, dtype=np.float64)))
+        if self.mode != 'linear':
+            return q[self.lo + (self.w > 0.)]
+
+        return RotationArray._slerp(q[self.lo], q[np.minimum(self.lo + 1, len(q) - 1)], self.w)
+
+class StreamAligner:
+    """
+    Online version of share_domain, for data that arrives in blocks.  Each source pushes timestamped blocks; once every
+    source has data past a domain point, that point is interpolated and emitted.  The output is the same as running
+    share_domain over everything pushed (in the same mode), split across pulls.
+
+    Only the samples still needed to bracket unemitted points are kept, in a fixed-capacity buffer per source, so
+    memory is bounded by maxlen and latency by the slowest source.
+
+    Synchronous use:  push() blocks, then pull() whatever is ready.
+    asyncio use:      await apush() (waits while a buffer is full) from producers, and 'async for x, ranges in aligner'
+                      from the consumer; close() ends the iteration.
+
+    """
+
+    """
+    Member variables:
+    _bufs   = list of _SampleBuffer, one per source
+    _quats  = list of bool, one per source
+    _mode   = str, see InterpPlan
+    _last   = float, last domain point emitted (None before the first)
+    _closed = bool
+    _cond   = asyncio.Condition, created on first async use
+    _loop   = asyncio event loop _cond was created on
+    _notify = asyncio.Task, waking the async waiters after close() (kept so it isn't collected before it runs)
+    """
+
+    def __init__(self,
+                 nsources: int,
+                 quats:    'iterable of bool' = None,
+                 mode:     str = 'linear',
+                 maxlen:   int = 65536):
+        """
+        :param nsources: number of sources
+        :param quats:    flags, one per source, marking scalar-first quaternion sources (slerped)
+        :param mode:     'linear', 'previous' or 'nearest'; see InterpPlan
+        :param maxlen:   maximum number of samples buffered per source
+        """
+
+        if mode not in InterpPlan.MODES:
+            raise ValueError("Interpolation mode must be one of {}, not '{}'".format(InterpPlan.MODES, mode))
+
+        self._bufs   = [_SampleBuffer(maxlen) for _ in range(nsources)]
+        self._quats  = [False] * nsources if quats is None else list(quats)
+        self._mode   = mode
+        self._last   = None
+        self._closed = False
+        self._cond   = None
+        self._loop   = None
+        self._notify = None
+
+    def push(self,
+             source: int,
+             t:      'numpy.ndarray, (n,)',
+             y:      'numpy.ndarray, (n,) or (n,k)'):
+        """
+        Adds a block of samples for a source.  Time stamps must keep increasing across blocks.
+
+        :raises BufferError: if the source's buffer would exceed maxlen (pull, or push the lagging sources, first)
+        """
+
+        t = np.ravel(np.asarray(t, dtype=np.float64))
+        y = np.asarray(y, dtype=np.float64)
+        if len(y) != len(t):
+            raise ValueError('Block must have one sample per time stamp')
+
+        self._bufs[source].append(t, y)
+
+    def pull(self):
+        """
+        Emits all domain points that every source has data beyond (or reached), interpolating each source.
+
+        :return: (domain points, list of ranges), as share_domain; None if nothing is ready
+        """
+
+        if any(len(b) == 0 for b in self._bufs):
+            return None
+
+        watermark = min(b.t[-1] for b in self._bufs)
+        floor     = max(b.t[0]  for b in self._bufs) if self._last is None else self._last
+
+        # pending domain points: every buffered time stamp past the last emitted point, up to the watermark
+        parts = []
+        for b in self._bufs:
+            t = b.t
+            parts.append(t[np.searchsorted(t, floor, side='left' if self._last is None else 'right'):
+                           np.searchsorted(t, watermark, side='right')])
+        x = np.sort(np.concatenate(parts), kind='stable')
+        x = x[np.concatenate(([True], np.diff(x) != 0))] if len(x) else x
+        if len(x) == 0:
+            return None
+
+        ranges = []
+        for b, isquat in zip(self._bufs, self._quats):
+            plan = InterpPlan(b.t, x, self._mode)
+            ranges.append(plan.quat(b.y) if isquat else plan(b.y))
+
+            # drop samples no longer needed to bracket later points
+            b.discard(np.searchsorted(b.t, x[-1], side='right') - 1)
+
+        self._last = x[-1]
+        return x, ranges
+
+    async def apush(self,
+                    source: int,
+                    t:      'numpy.ndarray, (n,)',
+                    y:      'numpy.ndarray, (n,) or (n,k)'):
+        """
+        push() for asyncio producers; waits for the consumer while the source's buffer is too full for the block.
+
+        :raises BufferError: if the block is larger than maxlen, so would never fit
+        """
+
+        if len(t) > self._bufs[source].maxlen:
+            raise BufferError('Block of {} samples exceeds the StreamAligner buffer ({} samples)'.format(
+                len(t), self._bufs[source].maxlen))
+
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self._bufs[source].fits(len(t)) or self._closed)
+            self.push(source, t, y)
+            cond.notify_all()
+
+    def close(self):
+        """
+        Marks the end of the streams; async iteration stops once nothing more can be emitted.  May be called from any
+        thread, or outside the event loop.
+        """
+
+        self._closed = True
+        if self._cond is not None and not self._loop.is_closed():
+            async def notify():
+                async with self._cond:
+                    self._cond.notify_all()
+
+            def schedule():
+                self._notify = self._loop.create_task(notify())
+
+            # on the aligner's own loop, which the waiters are on, whichever thread or loop close() is called from
+            self._loop.call_soon_threadsafe(schedule)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        cond = self._condition()
+        async with cond:
+            while True:
+                out = self.pull()
+                if out is not None:
+                    cond.notify_all()  # buffers were trimmed
+                    return out
+                if self._closed:
+                    raise StopAsyncIteration
+                await cond.wait()
+
+    def _condition(self):
+        if self._cond is None:
+            import asyncio
+
+            self._cond = asyncio.Condition()
+            self._loop = asyncio.get_running_loop()
+        return self._cond
+
+class _SampleBuffer:
+    """
+    Fixed-capacity buffer of (time, value) samples for StreamAligner; appends at the end, discards from the front,
+    and compacts in place when it runs out of room at the end.
+
+    """
+
+    def __init__(self, maxlen: int):
+        self._maxlen = maxlen
+        self._t      = None
+        self._y      = None
+        self._start  = 0
+        self._stop   = 0
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def t(self):
+        return self._t[self._start:self._stop]
+
+    @property
+    def y(self):
+        return self._y[self._start:self._stop]
+
+    @property
+    def maxlen(self):
+        return self._maxlen
+
+    def fits(self, n: int):
+        return len(self) + n <= self._maxlen
+
+    def append(self, t, y):
+        if self._t is None:
+            self._t = np.empty(self._maxlen)
+            self._y = np.empty((self._maxlen,) + y.shape[1:])
+        if not self.fits(len(t)):
+            raise BufferError('StreamAligner buffer full ({} samples); pull, or push the lagging sources, '
+                              'first'.format(self._maxlen))
+        if len(self) and len(t) and t[0] <= self._t[self._stop - 1]:
+            raise ValueError('Time stamps must increase across blocks')
+
+        if self._stop + len(t) > self._maxlen:
+            n = len(self)
+            self._t[:n] = self._t[self._start:self._stop]
+            self._y[:n] = self._y[self._start:self._stop]
+            self._start, self._stop = 0, n
+
+        self._t[self._stop:self._stop + len(t)] = t
+        self._y[self._stop:self._stop + len(t)] = y
+        self._stop += len(t)
+
+    def discard(self, n: int):
+        self._start += max(n, 0)
+
+# header tokens to rewrite (or drop, if None) when converting tables; these are units that some tools write as
+# separate whitespace-delimited words, without a data column of their own
+HEADER_MAP = {'(ft/s)':  None,
+              '(deg/s)': None}
 
 def convertToMAT(path_old:     str,
                  path_new:     str,
                  includecols:  tuple = None,
-                 delete_orig:  bool  = False):
+                 delete_orig:  bool  = False,
+                 hdrmap:       dict  = None,
+                 fmt:          str   = '5',
+                 chunksize:    int   = 65536):
     """
-    Converts a given table file to MAT file format.  Stores the contents as nx1 arrays by header names.
+    Converts a given table file to MAT file format.  Stores the contents as 1xn arrays by header names.
+
+    The table is parsed in vectorized chunks (only included columns are converted) and each chunk is written straight
+    into its place in the output file, so memory use is bounded by chunksize, not by the file size.
 
     :param path_old:    path to the ascii-formatted file
     :param path_new:    path to the new, MAT-formatted file
     :param includecols: if not None, used to specify which columns in the file to include
     :param delete_orig: delete the old file
+    :param hdrmap:      dict of header token -> replacement (None to drop the token); HEADER_MAP by default
+    :param fmt:         '5' for an uncompressed MAT v5 file, '7.3' for an HDF5-based MAT v7.3 file (requires h5py)
+    :param chunksize:   number of rows parsed at a time
     :return: nothing
     """
     # TODO: add some parsing to map common column names to a standard formatted set (i.e. "Time" "time (s)" etc.)
-    # TODO: add more "unit cleansing" stuff
+
+    if hdrmap is None:
+        hdrmap = HEADER_MAP
 
     with open(path_old, 'r') as f:
-        lines = list(f)
-        hdr   = lines.pop(0).split()                                          # remove header line, split by whitespace
-        hdr   = [h for h in hdr if h != '(ft/s)' and h != '(deg/s)']          # clean units stuff
+        hdr = [hdrmap.get(h, h) for h in f.readline().split()] # split by whitespace
+        hdr = [h for h in hdr if h is not None]                # clean units stuff
         # TODO: make above only take header items for which data exists
         if includecols is None: includecols = [ii for ii in range(len(hdr))]  # make includecols include all if not specified
-        arrays = [np.empty((len(lines)), dtype=float) for col in includecols] # make list of preallocated arrays
-        for row, line in enumerate(lines):
-            words = line.split()                        # break line into tokens
-            for array, col in zip(arrays, includecols): # loop through include cols
-                array[row] = float(words[col])          # put values in array
 
-    data = {hdr[col] : np.squeeze(array) for col, array in zip(includecols, arrays)}
+        # count rows up front, so every variable's place in the output is known before parsing
+        start = f.tell()
+        nrows = sum(1 for line in f if not line.isspace())
+        f.seek(start)
 
-    savemat(path_new, data)
+        # later columns win on repeated names
+        names  = list({hdr[col]: ii for ii, col in enumerate(includecols)}.items())
+        writer = {'5': _MAT5Writer, '7.3': _MAT73Writer}.get(fmt)
+        if writer is None:
+            raise ValueError("MAT format must be '5' or '7.3', not '{}'".format(fmt))
+
+        with writer(path_new, [nm for nm, _ in names], nrows) as w:
+            row = 0
+            for block in _iter_blocks(f, list(includecols), chunksize, None, np.float64, ''):
+                for var, (_, ii) in enumerate(names):
+                    w.write(var, row, block[:, ii])
+                row += len(block)
 
     if delete_orig:
         remove(path_old)
 
+def convertTree(paths:       'str or iterable of str',
+                pattern:     str  = '*.dat',
+                jobs:        int  = None,
+                delete_orig: bool = False,
+                force:       bool = False,
+                verbose:     bool = True,
+                **kwargs):
+    """
+    Converts every matching table under the given directories (or matching the given globs) to a MAT file next to
+    it, in parallel across a process pool.  Each output is written to a temporary file and renamed into place, so an
+    interrupted run never leaves a partial .mat file; outputs newer than their source are skipped.
+
+    :param paths:       directory to search recursively, file, or glob pattern (** allowed), or an iterable of these
+    :param pattern:     filename pattern to match in directories
+    :param jobs:        number of worker processes; all cores if not specified
+    :param delete_orig: delete each original once converted
+    :param force:       convert even if the output is up to date
+    :param verbose:     print progress and throughput
+    :param kwargs:      passed through to convertToMAT (includecols, hdrmap, fmt, chunksize)
+
+    :return: dict of source path -> 'converted', 'skipped' or the error raised
+    """
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    paths = [paths] if isinstance(paths, str) else paths  # a str is iterable, but it's one path
+
+    srcs = []
+    for p in sanitize_to_iterable(paths):
+        if isdir(p):
+            srcs.extend(sorted(glob(join(p, '**', pattern), recursive=True)))
+        elif isfile(p):
+            srcs.append(p)
+        else:
+            srcs.extend(sorted(glob(p, recursive=True)))
+
+    results = {}
+    nbytes  = 0
+    t0      = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(_convert_one, src, delete_orig, force, kwargs): src for src in srcs}
+        for count, fut in enumerate(as_completed(futures), 1):
+            src = futures[fut]
+            try:
+                results[src], size = fut.result()
+                nbytes += size
+            except Exception as e:
+                results[src] = e
+            if verbose:
+                status = results[src] if isinstance(results[src], str) else 'FAILED: {!r}'.format(results[src])
+                print('[{}/{}] {} {}'.format(count, len(srcs), src, status))
+
+    if verbose:
+        dt = time.perf_counter() - t0
+        mb = nbytes / 2**20
+        print('Converted {} of {} files, {:.1f} MB in {:.1f} s ({:.1f} MB/s)'.format(
+            sum(r == 'converted' for r in results.values()), len(srcs), mb, dt, mb / max(dt, 1e-9)))
+
+    return results
+
+def _convert_one(src:         str,
+                 delete_orig: bool,
+                 force:       bool,
+                 kwargs:      dict):
+    """
+    convertTree worker.  Converts src to a .mat file beside it, through a temporary file.
+
+    :return: 'converted' or 'skipped', bytes of source converted
+    """
+
+    dst = splitext(src)[0] + '.mat'
+    if not force and isfile(dst) and getmtime(dst) >= getmtime(src):
+        return 'skipped', 0
+
+    size = getsize(src)
+    tmp  = '{}.tmp{}'.format(dst, os.getpid())
+    try:
+        convertToMAT(src, tmp, **kwargs)
+        os.replace(tmp, dst)
+    finally:
+        if isfile(tmp):
+            remove(tmp)
+
+    if delete_orig:
+        remove(src)
+
+    return 'converted', size
+
+class _MAT5Writer:
+    """
+    Writes 1xn double variables to an uncompressed MAT v5 file, filling in each variable's data by row range.
+
+    """
+
+    # data types and classes used, from the MAT-file format spec
+    MIINT8    = 1
+    MIINT32   = 5
+    MIUINT32  = 6
+    MIDOUBLE  = 9
+    MIMATRIX  = 14
+    MXDOUBLE  = 6
+
+    def __init__(self,
+                 fname: str,
+                 names: list,
+                 nrows: int):
+        """
+        Lays out the file: writes the file header and every variable's headers, and sizes the file to fit the data.
+
+        :param fname: path to the new file
+        :param names: variable names
+        :param nrows: length of every variable
+        """
+
+        self._f   = open(fname, 'wb')
+        self._off = []
+
+        text = 'MATLAB 5.0 MAT-file, Platform: {}, Created on: {}'.format(sys.platform, time.asctime())
+        self._f.write(text.encode().ljust(116)[:116] + bytes(8) + struct.pack('<H', 0x0100) + b'IM')
+
+        for nm in names:
+            bname = nm.encode()
+            npad  = -len(bname) % 8
+            sub   = (struct.pack('<II', self.MIUINT32, 8) + struct.pack('<II', self.MXDOUBLE, 0)
+                     + struct.pack('<II', self.MIINT32, 8) + struct.pack('<ii', 1, nrows)
+                     + struct.pack('<II', self.MIINT8, len(bname)) + bname + bytes(npad)
+                     + struct.pack('<II', self.MIDOUBLE, 8 * nrows))
+            self._f.write(struct.pack('<II', self.MIMATRIX, len(sub) + 8 * nrows) + sub)
+            self._off.append(self._f.tell())
+            self._f.seek(8 * nrows, os.SEEK_CUR)
+
+        self._f.truncate()
+
+    def write(self,
+              var: int,
+              row: int,
+              dat: 'numpy.ndarray'):
+        """
+        Writes dat into variable number var, starting at row.
+        """
+
+        self._f.seek(self._off[var] + 8 * row)
+        self._f.write(np.ascontiguousarray(dat, dtype='<f8').tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+class _MAT73Writer:
+    """
+    Writes 1xn double variables to a MAT v7.3 (HDF5-based) file, filling in each variable's data by row range.
+
+    """
+
+    def __init__(self,
+                 fname: str,
+                 names: list,
+                 nrows: int):
+        """
+        Creates the file and one dataset per variable.
+
+        :param fname: path to the new file
+        :param names: variable names
+        :param nrows: length of every variable
+        """
+
+        import h5py  # optional dependency, only for v7.3 output
+
+        self._fname = fname
+        self._f     = h5py.File(fname, 'w', userblock_size=512)
+        self._dsets = []
+        for nm in names:
+            # MATLAB dims are stored reversed, so a 1xn variable is an (n,1) dataset
+            ds = self._f.create_dataset(nm, shape=(nrows, 1), dtype='<f8', chunks=(min(max(nrows, 1), 2**16), 1))
+            ds.attrs['MATLAB_class'] = np.bytes_('double')
+            self._dsets.append(ds)
+
+    def write(self,
+              var: int,
+              row: int,
+              dat: 'numpy.ndarray'):
+        """
+        Writes dat into variable number var, starting at row.
+        """
+
+        self._dsets[var][row:row + len(dat), 0] = dat
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+        # MATLAB recognizes the file by the text header in the HDF5 user block
+        text = 'MATLAB 7.3 MAT-file, Platform: {}, Created on: {} HDF5 schema 1.00 .'.format(sys.platform,
+                                                                                         time.asctime())
+        with open(self._fname, 'r+b') as f:
+            f.write(text.encode().ljust(116)[:116] + bytes(8) + struct.pack('<H', 0x0200) + b'IM')
+
 def is_monotonic(arr: np.ndarray):
     """
     Returns whether the array given is monotonically increasing or decreasing.  Sections where the values stay the same